@@ -1,6 +1,9 @@
 """
 This is a very simple engine to get the best move and the current
 score by using Stockfish. This implementation uses a endless loop.
+The same Stockfish process (and its hash table) is used for the whole
+session. When the position changes call `set_position` and the current
+analysis is stopped and a new one is started right away.
 Use:
     import time
 
@@ -12,38 +15,163 @@ Use:
             print("Score:", analyses.score, "\tBest move:", analyses.moves[0])
         time.sleep(0.1)
 
+    analyses.set_position(chess.Board("8/8/8/4k3/8/8/4P3/4K3 w - - 0 1"))
+    ...
     analyses.stop()
+
+It can also analyse more than 1 line (multi-PV). Instead of polling you
+can subscribe to the updates. The callback is called (from the analysis
+thread) with a list of `Line`s every time a line changes:
+    analyses = Analyse(chess.Board(), multipv=3)
+    analyses.subscribe(lambda lines: print(lines[0].score, lines[0].pv))
+    analyses.start()
+`Analyse.snapshot()` returns the same list at any time.
+
+When the position changes the lines are saved in `CACHE` (keyed by the
+Zobrist hash). If we come back to the same position (for example after
+undo/redo) and the cached lines are deep enough they are shown right away
+and only replaced when Stockfish searches deeper than them.
 """
 
 
 from .SuperClass import SuperClass
+from .engine_pool import get_pool, ENGINE_ERRORS
+from .settings import Settings
+from collections import OrderedDict
+import chess.polyglot
 import chess.engine
 import threading
 
 
-"""
-Get the correct Stockfish file that the OS can use. Fix for Issue #20.
-    stockfish_11_x64      # For Linux 64 bit
-    stockfish_11_x32.exe  # For Windows 32 bit
-    stockfish_11_x64.exe  # For Windows 64 bit
-"""
-import Constants.settings as settings
-# Get the folder of all of the Sockfishes
-STOCKFISH_FOLDER = settings.Settings().evaluation.stockfish
-os_bits = str(settings.get_os_bits()) # Get the bit version of the OS
-# Get the file extension that the OS supports
-os_extension = settings.get_os_extension()
-# Combine everything to get the location
-STOCKFISH_LACATION = STOCKFISH_FOLDER+os_bits+os_extension
-del settings, os_bits, os_extension, STOCKFISH_FOLDER # clean up
+s = Settings().evaluation
+MULTIPV = s.multipv
+CACHE_SIZE = s.cache_mb
+CACHE_MIN_DEPTH = s.cache_min_depth
+del s # clean up
+
+# Rough sizes (in bytes) used to keep the cache inside its budget
+ENTRY_SIZE = 200
+LINE_SIZE = 400
+MOVE_SIZE = 60
+# How many times in a row a crashed Stockfish is replaced before giving up
+MAX_RESTARTS = 3
+
+
+class Line(SuperClass):
+    """
+    One line of the analysis. Don't change it after it is created as it
+    is shared between threads.
+    """
+    def __init__(self, multipv: int, depth: int, score: chess.engine.PovScore,
+                 nodes: int, nps: int, pv: list):
+        self.multipv = multipv
+        self.depth = depth
+        self.score = score
+        self.nodes = nodes
+        self.nps = nps
+        self.pv = pv
+
+    def __repr__(self) -> str:
+        return f"<Line {self.multipv} depth={self.depth} score={self.score}>"
+
+    @classmethod
+    def from_info(cls, info: dict):
+        return cls(info.get("multipv", 1), info.get("depth"),
+                   info.get("score"), info.get("nodes"), info.get("nps"),
+                   info.get("pv"))
+
+
+class EvaluationCache(SuperClass):
+    """
+    A least recently used cache of the final lines for each position that
+    was analysed. It is keyed by the Zobrist hash and it never uses more
+    than `size_mb` MB (approximately).
+    """
+    def __init__(self, size_mb: float=CACHE_SIZE):
+        self.max_size = int(size_mb*1024*1024)
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: int) -> list:
+        """
+        Returns the list of `Line`s for `key` or None.
+        """
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key: int, lines: list) -> None:
+        """
+        Saves the lines unless the cache already has deeper lines for
+        the same position.
+        """
+        if len(lines) == 0:
+            return None
+        with self.lock:
+            if key in self.entries:
+                old_lines = self.entries[key]
+                if depth_of(old_lines) > depth_of(lines):
+                    self.entries.move_to_end(key)
+                    return None
+                self.size -= self.size_of(old_lines)
+            self.entries[key] = lines
+            self.entries.move_to_end(key)
+            self.size += self.size_of(lines)
+            # Remove the least recently used entries
+            while (self.size > self.max_size) and (len(self.entries) > 1):
+                _, old_lines = self.entries.popitem(last=False)
+                self.size -= self.size_of(old_lines)
+
+    def size_of(self, lines: list) -> int:
+        size = ENTRY_SIZE
+        for line in lines:
+            size += LINE_SIZE+MOVE_SIZE*len(line.pv or ())
+        return size
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+def depth_of(lines: list) -> int:
+    """
+    Returns the depth of the shallowest line.
+    """
+    return min((line.depth or 0) for line in lines)
+
+
+# Shared by all of the `Analyse` objects
+CACHE = EvaluationCache()
 
 
 class Analyse(SuperClass):
-    def __init__(self, board: chess.Board):
-        self.board = board
+    def __init__(self, board: chess.Board, multipv: int=MULTIPV,
+                 min_depth: int=CACHE_MIN_DEPTH):
+        self.board = board.copy()
+        self.multipv = multipv
+        # Cached lines are only used if they are at least this deep
+        self.min_depth = min_depth
         self.running = True
         self.score = None
         self.moves = None
+        self.lines = {}
+        # Lines from Stockfish that are less deep than this are ignored
+        # because we already have deeper lines from the cache
+        self.seed_depth = 0
+        self.subscribers = []
+        # Stockfish only gets `ucinewgame` when this object changes
+        self.game = object()
+        self.analysis = None
+        self.lock = threading.Lock()
+        self.new_position = threading.Event()
+        self.load_from_cache()
 
     def start(self) -> None:
         """
@@ -63,31 +191,172 @@ class Analyse(SuperClass):
         thread for the mainloop.
         This loop runs until the `running` attribute is False.
         """
-        engine = chess.engine.SimpleEngine.popen_uci(STOCKFISH_LACATION)
+        crashes = 0
+        while self.running and (crashes <= MAX_RESTARTS):
+            try:
+                pool = get_pool()
+                engine = pool.checkout()
+            except (OSError, ValueError):
+                return None # There is no Stockfish or the pool was closed
+            try:
+                while self.running:
+                    self.analyse_position(engine)
+                    crashes = 0
+                    # Wait for a new position if Stockfish finished early
+                    # (for example if it is checkmate)
+                    self.new_position.wait()
+            except ENGINE_ERRORS:
+                # The engine crashed. Give it back (the pool throws it
+                # away) and start analysing `self.board` again with a new
+                # one.
+                crashes += 1
+                with self.lock:
+                    self.analysis = None
+            finally:
+                pool.checkin(engine)
 
-        with engine.analysis(self.board) as analysis:
+    def analyse_position(self, engine) -> None:
+        """
+        Analyses `self.board` until the position changes or `stop` is
+        called.
+        """
+        with self.lock:
+            self.new_position.clear()
+            board = self.board
+            self.analysis = engine.analysis(board, multipv=self.multipv,
+                                            game=self.game)
+        with self.analysis as analysis:
             for info in analysis:
+                if self.new_position.is_set() or (not self.running):
+                    break
+                # Only the infos with a pv are full lines
+                if info.get("pv") is not None:
+                    self.add_line(Line.from_info(info))
+        with self.lock:
+            self.analysis = None
 
-                new_score = info.get("score")
-                if new_score is not None:
-                    self.score = new_score
+    def add_line(self, line: Line) -> None:
+        """
+        Saves the new line and tells all of the subscribers about it.
+        """
+        with self.lock:
+            if self.new_position.is_set():
+                return None # The line is for the old position
+            if (line.depth or 0) < self.seed_depth:
+                return None # The cached line is better
+            self.seed_depth = 0
+            self._set_line(line)
+        self.publish()
 
-                new_moves = info.get("pv")
-                if new_moves is not None:
-                    self.moves = new_moves
+    def _set_line(self, line: Line) -> None:
+        self.lines[line.multipv] = line
+        if line.multipv == 1:
+            if line.score is not None:
+                self.score = line.score
+            self.moves = line.pv
 
-                if not self.running:
-                    break
-        engine.quit()
+    def publish(self) -> None:
+        """
+        Tells all of the subscribers about the current lines.
+        """
+        with self.lock:
+            if len(self.lines) == 0:
+                return None
+            snapshot = self._snapshot()
+            subscribers = tuple(self.subscribers)
+        for callback in subscribers:
+            callback(snapshot)
+
+    def save_to_cache(self) -> None:
+        """
+        Saves the current lines for `self.board` in the cache. Must be
+        called with `self.lock` acquired.
+        """
+        if len(self.lines) > 0:
+            key = chess.polyglot.zobrist_hash(self.board)
+            CACHE.put(key, self._snapshot())
+
+    def load_from_cache(self) -> None:
+        """
+        Uses the lines in the cache for `self.board` if they are deep
+        enough. Must be called with `self.lock` acquired.
+        """
+        key = chess.polyglot.zobrist_hash(self.board)
+        lines = CACHE.get(key)
+        if (lines is None) or (depth_of(lines) < self.min_depth):
+            return None
+        for line in lines[:self.multipv]:
+            self._set_line(line)
+        self.seed_depth = depth_of(lines)
+
+    def _snapshot(self) -> list:
+        return [self.lines[i] for i in sorted(self.lines.keys())]
+
+    def snapshot(self) -> list:
+        """
+        Returns a list of the current `Line`s sorted by their multipv.
+        """
+        with self.lock:
+            return self._snapshot()
+
+    def subscribe(self, callback) -> None:
+        """
+        `callback(lines: list)` is called from the analysis thread every
+        time a line is updated. If there already are lines (from the cache)
+        it is called right away.
+        """
+        with self.lock:
+            self.subscribers.append(callback)
+            lines = self._snapshot()
+        if len(lines) > 0:
+            callback(lines)
+
+    def unsubscribe(self, callback) -> None:
+        with self.lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def set_position(self, board: chess.Board) -> None:
+        """
+        Starts analysing a new position. The old score and moves are
+        cleared (or loaded from the cache).
+        """
+        with self.lock:
+            self.save_to_cache()
+            self.board = board.copy()
+            self.score = None
+            self.moves = None
+            self.lines = {}
+            self.seed_depth = 0
+            self.new_position.set()
+            self.stop_analysis()
+            self.load_from_cache()
+        # Show the cached lines right away
+        self.publish()
+
+    def stop_analysis(self) -> None:
+        """
+        Tells Stockfish to stop the current analysis.
+        """
+        if self.analysis is not None:
+            try:
+                self.analysis.stop()
+            except ENGINE_ERRORS:
+                pass
 
     def stop(self) -> None:
         """
         This stops the mainloop by setting the `running` attribute to False.
         """
-        self.running = False
+        with self.lock:
+            if self.running:
+                self.save_to_cache()
+            self.running = False
+            self.new_position.set()
+            self.stop_analysis()
 
     def kill(self) -> None:
         """
         This stops the mainloop by setting the `running` attribute to False.
         """
-        self.running = False
+        self.stop()
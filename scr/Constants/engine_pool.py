@@ -0,0 +1,207 @@
+"""
+This is a pool of long lived Stockfish processes. Starting Stockfish (and
+doing the UCI handshake) every time we need a move is slow and it also
+throws away Stockfish's hash table. Both `Players/computer.Computer` and
+`Constants/analyse.Analyse` use the same pool.
+Use:
+    pool = get_pool()
+    with pool.engine() as engine:
+        result = engine.play(board, limit, game=game)
+Pass the same `game` object to all of the `play`/`analysis` calls of a game
+and `ucinewgame` will only be sent when a new game starts.
+
+If an engine crashes it is thrown away when it is checked in and a new one
+is started the next time one is needed.
+"""
+
+
+from contextlib import contextmanager
+import chess.engine
+import threading
+import asyncio
+
+from .SuperClass import SuperClass
+
+
+"""
+Get the correct Stockfish file that the OS can use. Fix for Issue #20.
+    stockfish_11_x64      # For Linux 64 bit
+    stockfish_11_x32.exe  # For Windows 32 bit
+    stockfish_11_x64.exe  # For Windows 64 bit
+"""
+import Constants.settings as settings
+# Get the folder of all of the Sockfishes
+s = settings.Settings()
+STOCKFISH_FOLDER = s.evaluation.stockfish
+POOL_SIZE = s.evaluation.engine_pool_size
+HASH_SIZE = s.evaluation.engine_hash_mb
+os_bits = str(settings.get_os_bits()) # Get the bit version of the OS
+# Get the file extension that the OS supports
+os_extension = settings.get_os_extension()
+# Combine everything to get the location
+STOCKFISH_LOCATION = STOCKFISH_FOLDER+os_bits+os_extension
+del s, settings, os_bits, os_extension, STOCKFISH_FOLDER # clean up
+
+# The errors that mean that the engine is dead
+ENGINE_ERRORS = (chess.engine.EngineError,
+                 chess.engine.EngineTerminatedError,
+                 asyncio.TimeoutError,
+                 TimeoutError,
+                 OSError)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PoolTimeoutError(TimeoutError):
+    """
+    Raised by `EnginePool.checkout` if no engine was free in time.
+    """
+    pass
+
+
+class EnginePool(SuperClass):
+    def __init__(self, location: str=STOCKFISH_LOCATION, size: int=POOL_SIZE,
+                 options: dict=None):
+        if options is None:
+            options = {"Hash": HASH_SIZE}
+        self.location = location
+        self.size = size
+        self.options = options
+        self.idle = []
+        self.busy = []
+        self.running = True
+        self.condition = threading.Condition()
+
+    def spawn(self) -> chess.engine.SimpleEngine:
+        """
+        Starts a new engine process.
+        """
+        engine = chess.engine.SimpleEngine.popen_uci(self.location)
+        options = {name: value for name, value in self.options.items()
+                   if name in engine.options}
+        if len(options) > 0:
+            engine.configure(options)
+        return engine
+
+    def checkout(self, timeout: float=None) -> chess.engine.SimpleEngine:
+        """
+        Returns an engine that no one else is using. If all of them are
+        being used it waits for one to be checked in (raises
+        PoolTimeoutError after `timeout` seconds). You must call `checkin`
+        when you are done with it.
+        """
+        with self.condition:
+            available = lambda: (not self.running) or \
+                                (len(self.idle) > 0) or \
+                                (len(self.busy) < self.size)
+            if not self.condition.wait_for(available, timeout):
+                raise PoolTimeoutError("All of the engines are being used.")
+            if not self.running:
+                raise ValueError("The engine pool has been closed.")
+            if len(self.idle) > 0:
+                engine = self.idle.pop()
+            else:
+                engine = None
+            self.busy.append(engine)
+        try:
+            if engine is None:
+                new_engine = self.spawn()
+            elif not self.healthy(engine):
+                new_engine = self.restart(engine)
+            else:
+                return engine
+        except:
+            # Give the place back to the pool
+            with self.condition:
+                self.busy.remove(engine)
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.busy.remove(engine)
+            self.busy.append(new_engine)
+        return new_engine
+
+    def checkin(self, engine: chess.engine.SimpleEngine) -> None:
+        """
+        Gives the engine back to the pool. If the engine crashed it is
+        thrown away.
+        """
+        with self.condition:
+            self.busy.remove(engine)
+            keep = self.running and self.alive(engine)
+            if keep:
+                self.idle.append(engine)
+            self.condition.notify()
+        if not keep:
+            self.close_engine(engine)
+
+    @contextmanager
+    def engine(self, timeout: float=None):
+        """
+        Context manager version of `checkout` and `checkin`.
+        """
+        engine = self.checkout(timeout)
+        try:
+            yield engine
+        finally:
+            self.checkin(engine)
+
+    def alive(self, engine: chess.engine.SimpleEngine) -> bool:
+        """
+        Returns False if the engine process has stopped.
+        """
+        return not engine.returncode.done()
+
+    def healthy(self, engine: chess.engine.SimpleEngine) -> bool:
+        """
+        Checks that the engine still responds.
+        """
+        if not self.alive(engine):
+            return False
+        try:
+            engine.ping()
+            return True
+        except ENGINE_ERRORS:
+            return False
+
+    def restart(self, engine: chess.engine.SimpleEngine):
+        """
+        Closes the engine and starts a new one.
+        """
+        self.close_engine(engine)
+        return self.spawn()
+
+    def close_engine(self, engine: chess.engine.SimpleEngine) -> None:
+        try:
+            engine.close()
+        except ENGINE_ERRORS:
+            pass
+
+    def close(self) -> None:
+        """
+        Closes all of the idle engines. Engines that are being used are
+        closed when they are checked in.
+        """
+        with self.condition:
+            self.running = False
+            idle, self.idle = self.idle, []
+            self.condition.notify_all()
+        for engine in idle:
+            self.close_engine(engine)
+
+
+def get_pool() -> EnginePool:
+    """
+    Returns the pool that is shared by the whole program.
+    """
+    global _pool
+    with _pool_lock:
+        if (_pool is None) or (not _pool.running):
+            _pool = EnginePool()
+        return _pool
+
+def close_pool() -> None:
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
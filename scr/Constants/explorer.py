@@ -0,0 +1,302 @@
+"""
+This is an opening explorer for the PGN databases in
+`Constants/pgn_database.py`. It answers "which games reached this
+position and what was played next" without reading the PGN file.
+The index is a file ("<filename>.explorer") with a header and 2 tables
+that are both sorted by the zobrist hash:
+    records     One for each ply of each game
+     ----------------- ----------- ----------- -----------
+    | 8 bytes         | 4 bytes   | 2 bytes   | 2 bytes   |
+     ----------------- ----------- ----------- -----------
+    | zobrist hash    | game      | ply       | next move |
+     ----------------- ----------- ----------- -----------
+    stats       One for each move played from each position (a game is
+                only counted once for each position)
+     ----------------- ----------- -------------------------------
+    | 8 bytes         | 2 bytes   | 4 bytes each                  |
+     ----------------- ----------- -------------------------------
+    | zobrist hash    | move      | white won, draws, black won,  |
+    |                 |           | no result                     |
+     ----------------- ----------- -------------------------------
+A position is found with a binary search on the memory mapped file. The
+stats are worked out when the index is built so `stats` only reads a
+few rows even for the starting position of a database with millions of
+games. The index is built with one pass over the games: the records are
+sorted in runs that fit in memory which are then merged (`heapq.merge`)
+into the index. The index is rebuilt if the PGN file changes.
+Use:
+    with PGNDatabase("games.pgn") as database:
+        explorer = Explorer(database)  # Builds the index if it needs to
+    explorer.lookup(board)             # [(game, ply, move), ...]
+    explorer.stats(board)              # [(move, games, white, draws, black)]
+    explorer.close()
+"""
+
+
+import tempfile
+import chess.polyglot
+import chess.pgn
+import struct
+import shutil
+import heapq
+import mmap
+import os
+
+from io import StringIO
+
+from .pgn_database import PGNDatabase
+
+
+RECORD = struct.Struct("<QIHH")
+STAT = struct.Struct("<QHIIII")
+# magic, version, file size, file mtime, number of records, number of stats
+HEADER = struct.Struct("<4sIqqQQ")
+KEY = struct.Struct("<Q")
+MAGIC = b"CPYX"
+VERSION = 3
+EXPLORER_EXTENSION = ".explorer"
+RUN_SIZE = 1 << 20 # The number of records sorted in memory at once
+MAX_PLY = (1 << 16)-1
+
+# The result of each game (the same order as in STAT)
+WHITE_WON, DRAW, BLACK_WON, UNKNOWN = range(4)
+RESULTS = {"1-0": WHITE_WON, "1/2-1/2": DRAW, "0-1": BLACK_WON}
+
+
+def encode_move(move: chess.Move) -> int:
+    return move.from_square | (move.to_square << 6) | \
+           ((move.promotion or 0) << 12)
+
+def decode_move(value: int) -> chess.Move:
+    promotion = value >> 12
+    return chess.Move(value & 63, (value >> 6) & 63, promotion or None)
+
+
+class PositionVisitor(chess.pgn.BaseVisitor):
+    """
+    Used with `chess.pgn.read_game` to get the (hash, move) of each ply
+    in the main line without building the game tree.
+    """
+    def __init__(self):
+        self.positions = []
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def visit_move(self, board: chess.Board, move: chess.Move) -> None:
+        self.positions.append((chess.polyglot.zobrist_hash(board),
+                               encode_move(move)))
+
+    def handle_error(self, error: Exception) -> None:
+        pass # Keep the moves before the error
+
+    def result(self) -> list:
+        return self.positions
+
+
+class Explorer:
+    def __init__(self, database: PGNDatabase, run_size: int=RUN_SIZE):
+        self.filename = database.filename+EXPLORER_EXTENSION
+        self.file_id = database.file_id()
+        self.file = None
+        self.data = b""
+        self.records = 0
+        self.stats_start = HEADER.size
+        self.stats_count = 0
+        if not self.open():
+            build_index(database, self.filename, run_size)
+            if not self.open():
+                raise ValueError("Couldn't open the explorer index.")
+
+    def __len__(self) -> int:
+        return self.records
+
+    def open(self) -> bool:
+        """
+        Opens the index if it is there and was built from the same file.
+        """
+        try:
+            file = open(self.filename, "rb")
+        except OSError:
+            return False
+        header = file.read(HEADER.size)
+        size = os.fstat(file.fileno()).st_size
+        if len(header) != HEADER.size:
+            file.close()
+            return False
+        magic, version, *file_id, records, stats = HEADER.unpack(header)
+        if (magic != MAGIC) or (version != VERSION) or \
+           (tuple(file_id) != self.file_id) or \
+           (size != HEADER.size+records*RECORD.size+stats*STAT.size):
+            file.close()
+            return False
+        self.file = file
+        self.records = records
+        self.stats_start = HEADER.size+records*RECORD.size
+        self.stats_count = stats
+        if size > HEADER.size:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return True
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = b""
+        self.records = 0
+        self.stats_count = 0
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def find(self, key: int, start: int, count: int, size: int) -> tuple:
+        """
+        Returns `(first, end)` of the rows with that hash in the table
+        that starts at `start` and has `count` rows of `size` bytes.
+        """
+        data = self.data
+        key_at = lambda i: KEY.unpack_from(data, start+i*size)[0]
+        low, high = 0, count
+        while low < high:
+            middle = (low+high)//2
+            if key_at(middle) < key:
+                low = middle+1
+            else:
+                high = middle
+        first = low
+        high = count
+        while low < high:
+            middle = (low+high)//2
+            if key_at(middle) <= key:
+                low = middle+1
+            else:
+                high = middle
+        return first, low
+
+    def lookup(self, board: chess.Board) -> list:
+        """
+        Returns `[(game, ply, move), ...]` for every time a game reached
+        the position on the board.
+        """
+        key = chess.polyglot.zobrist_hash(board)
+        first, end = self.find(key, HEADER.size, self.records, RECORD.size)
+        data = self.data[HEADER.size+first*RECORD.size:
+                         HEADER.size+end*RECORD.size]
+        return [(game, ply, decode_move(move))
+                for _, game, ply, move in RECORD.iter_unpack(data)]
+
+    def stats(self, board: chess.Board) -> list:
+        """
+        Returns `[(move, games, white_won, draws, black_won), ...]` for the
+        moves played from the position on the board (the most played move
+        first).
+        """
+        key = chess.polyglot.zobrist_hash(board)
+        first, end = self.find(key, self.stats_start, self.stats_count,
+                               STAT.size)
+        data = self.data[self.stats_start+first*STAT.size:
+                         self.stats_start+end*STAT.size]
+        output = []
+        for _, move, white, draws, black, unknown in STAT.iter_unpack(data):
+            games = white+draws+black+unknown
+            output.append((decode_move(move), games, white, draws, black))
+        output.sort(key=lambda stat: -stat[1])
+        return output
+
+
+def build_index(database: PGNDatabase, filename: str,
+                run_size: int=RUN_SIZE) -> None:
+    """
+    Builds the explorer index for the database. The runs are kept in a
+    temporary folder next to `filename`.
+    """
+    results = bytes(RESULTS.get(tags[4], UNKNOWN) for tags in database.tags)
+    folder = os.path.dirname(os.path.abspath(filename))
+    with tempfile.TemporaryDirectory(dir=folder) as temp_folder:
+        runs = []
+        records = []
+        for game in range(len(database)):
+            positions = chess.pgn.read_game(StringIO(database.pgn(game)),
+                                            Visitor=PositionVisitor)
+            if positions is None:
+                continue
+            for ply, (key, move) in enumerate(positions[:MAX_PLY]):
+                records.append((key, game, ply, move))
+            if len(records) >= run_size:
+                runs.append(write_run(records, temp_folder, len(runs)))
+                records = []
+        if (len(records) > 0) or (len(runs) == 0):
+            runs.append(write_run(records, temp_folder, len(runs)))
+
+        files = [open(run, "rb") for run in runs]
+        stats_filename = os.path.join(temp_folder, "stats")
+        try:
+            merged = heapq.merge(*map(read_run, files))
+            with open(filename+".part", "wb") as output, \
+                 open(stats_filename, "w+b") as stats_file:
+                output.write(b"\x00"*HEADER.size) # Written at the end
+                records = 0
+                stats = 0
+                buffer = bytearray()
+                stats_buffer = bytearray()
+                key = None
+                counts = {}
+                last_game = None
+                for record in merged:
+                    if record[0] != key:
+                        stats += write_stats(stats_buffer, key, counts)
+                        key = record[0]
+                        counts = {}
+                        last_game = None
+                    # A game that reaches the position more than once is
+                    # only counted for the first time (the records are
+                    # sorted by the game after the hash)
+                    if record[1] != last_game:
+                        last_game = record[1]
+                        count = counts.get(record[3])
+                        if count is None:
+                            count = counts[record[3]] = [0, 0, 0, 0]
+                        count[results[record[1]]] += 1
+                    buffer += RECORD.pack(*record)
+                    records += 1
+                    if len(buffer) >= 1 << 16:
+                        output.write(buffer)
+                        buffer.clear()
+                    if len(stats_buffer) >= 1 << 16:
+                        stats_file.write(stats_buffer)
+                        stats_buffer.clear()
+                stats += write_stats(stats_buffer, key, counts)
+                output.write(buffer)
+                stats_file.write(stats_buffer)
+                # The stats go after all of the records
+                stats_file.seek(0)
+                shutil.copyfileobj(stats_file, output)
+                output.seek(0)
+                output.write(HEADER.pack(MAGIC, VERSION, *database.file_id(),
+                                         records, stats))
+        finally:
+            for file in files:
+                file.close()
+    os.replace(filename+".part", filename)
+
+def write_stats(buffer: bytearray, key: int, counts: dict) -> int:
+    """
+    Adds the stats for each move from the position to `buffer` and returns
+    how many were added.
+    """
+    for move in sorted(counts):
+        buffer += STAT.pack(key, move, *counts[move])
+    return len(counts)
+
+def write_run(records: list, folder: str, n: int) -> str:
+    records.sort()
+    filename = os.path.join(folder, "run%d" % n)
+    with open(filename, "wb") as file:
+        file.write(b"".join(RECORD.pack(*record) for record in records))
+    return filename
+
+def read_run(file):
+    while True:
+        data = file.read(RECORD.size*4096)
+        if not data:
+            break
+        yield from RECORD.iter_unpack(data)
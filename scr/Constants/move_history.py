@@ -0,0 +1,78 @@
+"""
+This keeps the SAN move history of a game so that the PGN doesn't have
+to be worked out by replaying the whole game after each move. The text
+is made out of one chunk for each ply:
+    white's ply         "1. e4"    ("\n2. d4" after the first chunk)
+    black's ply         " e5"
+    black's first ply   "1... e5"  (only if the game starts with black)
+so pushing or popping a move only adds or removes the last chunk.
+Use:
+    history = MoveHistory(board)
+    history.push(board.san(move))
+    board.push(move)
+    history.pop()
+    history.text() # "1. e4"
+`generation` changes every time the history is reset so anything that
+shows the text knows when it has to start again.
+"""
+
+
+import chess
+
+from .SuperClass import SuperClass
+
+
+class MoveHistory(SuperClass):
+    def __init__(self, board: chess.Board=None):
+        self.generation = 0
+        self.reset(board)
+
+    def reset(self, board: chess.Board=None) -> None:
+        """
+        Clears the history. The move numbers start from `board`'s root
+        position (where its move stack starts).
+        """
+        if board is None:
+            board = chess.Board()
+        root = board.root()
+        self.start_turn = root.turn
+        self.start_number = root.fullmove_number
+        self.chunks = []
+        self.generation += 1
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def next_chunk(self, san: str) -> str:
+        """
+        Returns the text for the next ply if its SAN is `san`.
+        """
+        ply = len(self.chunks)
+        if self.start_turn == chess.BLACK:
+            ply += 1
+        number = self.start_number+ply//2
+        if ply%2 == 1:
+            # Black's move
+            if len(self.chunks) == 0:
+                return str(number)+"... "+san
+            return " "+san
+        if len(self.chunks) == 0:
+            return str(number)+". "+san
+        return "\n"+str(number)+". "+san
+
+    def push(self, san: str) -> str:
+        """
+        Adds the ply and returns the text that was added.
+        """
+        chunk = self.next_chunk(san)
+        self.chunks.append(chunk)
+        return chunk
+
+    def pop(self) -> str:
+        """
+        Removes the last ply and returns the text that was removed.
+        """
+        return self.chunks.pop()
+
+    def text(self) -> str:
+        return "".join(self.chunks)
@@ -0,0 +1,279 @@
+"""
+This reads PGN files that have a lot of games (a database) without
+loading the whole file. The file is memory mapped and scanned once to
+find where each game starts and what its main headers are. That index is
+saved next to the file (as "<filename>.idx") so opening the same file
+again doesn't have to scan it. The index is rebuilt if the file's size
+or modification time changes.
+Use:
+    database = PGNDatabase("games.pgn")
+    len(database)                       # The number of games
+    database.pgn(0)                     # The text of the first game
+    database.game(0)                    # The first game as a chess.pgn.Game
+    database.headers(0)                 # {"White": ..., "Black": ..., ...}
+    database.filter(player="Carlsen", result="1-0") # [game numbers]
+    database.close()
+"""
+
+
+import chess.pgn
+import struct
+import array
+import json
+import mmap
+import sys
+import re
+import os
+
+from io import StringIO
+
+
+# The headers that are kept in the index (the rest are read from the file)
+INDEX_TAGS = ("Event", "Date", "White", "Black", "Result")
+INDEX_VERSION = 3
+INDEX_EXTENSION = ".idx"
+INDEX_MAGIC = b"CPYI"
+INDEX_HEADER = struct.Struct("<4sIqqQ")
+
+TAG_PATTERN = re.compile(rb'^\[\s*(\w+)\s+"(.*)"\s*\]')
+UTF8_BOM = b"\xef\xbb\xbf"
+RESULTS = (b"1-0", b"0-1", b"1/2-1/2", b"*")
+
+
+def strip_comments(line: bytes, in_comment: bool) -> tuple:
+    """
+    Removes the comments ("{ ... }" and "; ...") from a line of moves.
+    `in_comment` is True if the line starts inside a "{" comment. Returns
+    `(moves, in_comment)` where `in_comment` is True if the comment goes
+    on to the next line.
+    """
+    moves = b""
+    start = 0
+    while True:
+        if in_comment:
+            end = line.find(b"}", start)
+            if end == -1:
+                return moves, True
+            start = end+1
+            in_comment = False
+        else:
+            brace = line.find(b"{", start)
+            semicolon = line.find(b";", start)
+            if (semicolon != -1) and ((brace == -1) or (semicolon < brace)):
+                return moves+line[start:semicolon], False
+            if brace == -1:
+                return moves+line[start:], False
+            moves += line[start:brace]+b" "
+            start = brace+1
+            in_comment = True
+
+
+class PGNDatabase:
+    def __init__(self, filename: str, save_index: bool=True):
+        self.filename = filename
+        self.file = open(filename, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size == 0:
+            self.data = b"" # mmap can't map an empty file
+        else:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        # Where each game starts. The last item is the end of the file.
+        self.offsets = array.array("Q")
+        # A tuple (in the same order as `INDEX_TAGS`) for each game
+        self.tags = []
+        if not self.load_index():
+            self.build_index()
+            if save_index:
+                self.save_index()
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = b""
+        self.file.close()
+
+    @property
+    def index_filename(self) -> str:
+        return self.filename+INDEX_EXTENSION
+
+    def file_id(self) -> tuple:
+        stat = os.stat(self.filename)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def load_index(self) -> bool:
+        """
+        Loads the saved index if it is still valid. Returns True if it was
+        loaded. The index file is only data (see `save_index`) so a bad
+        one can't do anything other than be rebuilt.
+        """
+        try:
+            with open(self.index_filename, "rb") as file:
+                data = file.read()
+            magic, version, size, mtime, games = INDEX_HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return False
+        if (magic != INDEX_MAGIC) or (version != INDEX_VERSION):
+            return False
+        if (size, mtime) != self.file_id():
+            return False
+        start = INDEX_HEADER.size
+        end = start+(games+1)*8
+        if len(data) < end:
+            return False
+        offsets = array.array("Q")
+        offsets.frombytes(data[start:end])
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        try:
+            tags = json.loads(data[end:].decode("utf-8"))
+        except (UnicodeDecodeError, ValueError):
+            return False
+        if (not isinstance(tags, list)) or (len(tags) != games):
+            return False
+        for i, game_tags in enumerate(tags):
+            if (not isinstance(game_tags, list)) or \
+               (len(game_tags) != len(INDEX_TAGS)) or \
+               (not all(isinstance(tag, str) for tag in game_tags)):
+                return False
+            tags[i] = tuple(game_tags)
+        self.offsets = offsets
+        self.tags = tags
+        return True
+
+    def save_index(self) -> None:
+        """
+        The index file is:
+            INDEX_HEADER    magic, version, file size, file mtime, games
+            offsets         (games+1) little endian uint64s
+            tags            JSON list with a list of `INDEX_TAGS` per game
+        """
+        offsets = array.array("Q", self.offsets)
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        header = INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION,
+                                   *self.file_id(), len(self.tags))
+        tags = json.dumps(self.tags, ensure_ascii=False,
+                          separators=(",", ":")).encode("utf-8")
+        try:
+            with open(self.index_filename, "wb") as file:
+                file.write(header)
+                file.write(offsets.tobytes())
+                file.write(tags)
+        except OSError:
+            pass # The folder might be read only
+
+    def build_index(self) -> None:
+        """
+        Scans the file line by line to find where each game starts. A game
+        starts at the first header line (a line starting with "[") after
+        the moves of the last game or at the first moves if the game has
+        no headers. Lines in a comment (like a "[%clk ...]" that was
+        wrapped onto its own line) never start a game.
+        """
+        offsets = array.array("Q")
+        all_tags = []
+        data = self.data
+        size = len(data)
+        position = 3 if data[:3] == UTF8_BOM else 0
+        in_headers = False
+        in_game = False
+        in_comment = False
+        tags = None
+        while position < size:
+            end = data.find(b"\n", position)
+            if end == -1:
+                end = size
+            line = data[position:end].strip()
+            if (not in_comment) and line.startswith(b"["):
+                if not in_headers:
+                    # A new game
+                    if tags is not None:
+                        all_tags.append(tuple(tags.get(tag, "?")
+                                              for tag in INDEX_TAGS))
+                    offsets.append(position)
+                    tags = {}
+                    in_headers = True
+                    in_game = True
+                match = TAG_PATTERN.match(line)
+                if match is not None:
+                    name = match.group(1).decode("utf-8", "replace")
+                    if name in INDEX_TAGS:
+                        tags[name] = match.group(2).decode("utf-8", "replace")
+            elif (line != b"") and (in_comment or (not line.startswith(b"%"))):
+                moves, in_comment = strip_comments(line, in_comment)
+                moves = moves.strip()
+                if (not in_game) and (moves != b""):
+                    # A game without any headers
+                    if tags is not None:
+                        all_tags.append(tuple(tags.get(tag, "?")
+                                              for tag in INDEX_TAGS))
+                    offsets.append(position)
+                    tags = {}
+                    in_game = True
+                in_headers = False
+                # Games without headers are split by the result
+                if moves.endswith(RESULTS):
+                    in_game = False
+            position = end+1
+        if tags is not None:
+            all_tags.append(tuple(tags.get(tag, "?") for tag in INDEX_TAGS))
+        offsets.append(size)
+        self.offsets = offsets
+        self.tags = all_tags
+
+    def pgn(self, n: int) -> str:
+        """
+        Returns the text of game `n` (starting from 0).
+        """
+        if not (0 <= n < len(self)):
+            raise IndexError("There is no game "+str(n))
+        start, end = self.offsets[n], self.offsets[n+1]
+        return self.data[start:end].decode("utf-8", "replace")
+
+    def game(self, n: int) -> chess.pgn.Game:
+        return chess.pgn.read_game(StringIO(self.pgn(n)))
+
+    def headers(self, n: int) -> dict:
+        """
+        Returns the headers of game `n` that are in the index.
+        """
+        if not (0 <= n < len(self)):
+            raise IndexError("There is no game "+str(n))
+        return dict(zip(INDEX_TAGS, self.tags[n]))
+
+    def filter(self, player: str=None, white: str=None, black: str=None,
+               result: str=None, event: str=None) -> list:
+        """
+        Returns the numbers of the games that match all of the arguments
+        that aren't None. The names are matched if they contain the text
+        (ignoring the case) and the result must be exactly the same.
+        """
+        def contains(text: str, value: str) -> bool:
+            return (text is None) or (text in value.lower())
+
+        player = None if player is None else player.lower()
+        white = None if white is None else white.lower()
+        black = None if black is None else black.lower()
+        event = None if event is None else event.lower()
+        output = []
+        for n, (_event, _, _white, _black, _result) in enumerate(self.tags):
+            if (result is not None) and (result != _result):
+                continue
+            if not (contains(white, _white) and contains(black, _black)):
+                continue
+            if not contains(event, _event):
+                continue
+            if (player is not None) and (not contains(player, _white)) and \
+               (not contains(player, _black)):
+                continue
+            output.append(n)
+        return output
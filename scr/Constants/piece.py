@@ -7,6 +7,79 @@ from .position import Position
 
 SETTINGS = Settings().gameboard
 SPRITES_LOCATION = "Sprites/"
+PIECE_TAG = "piece" # The tkinter canvas tag that all of the pieces have
+NAMES = ("pawn", "knight", "bishop", "rook", "queen", "king")
+
+# The decoded PNGs: {(set, name, colour): PIL.Image}
+IMAGES = {}
+# The resized sprites ready for tkinter:
+#     {(set, name, colour, size_of_squares, scale): ImageTk.PhotoImage}
+# `scale` is eather a float or the (width, height) of the sprite.
+SPRITES = {}
+
+
+def get_filename(name: str, colour: bool, set: int) -> str:
+    """
+    Gets the filename for the sprite file based on the name, colour,
+    and set number
+    """
+    if colour:
+        colour = "white"
+    else:
+        colour = "black"
+    return SPRITES_LOCATION+"set."+str(set)+"/"+name+"."+colour+".png"
+
+def get_image(name: str, colour: bool, set: int) -> Image.Image:
+    """
+    Returns the original (not resized) image. The file is only read once.
+    """
+    key = (set, name, colour)
+    if key not in IMAGES:
+        image = Image.open(get_filename(name, colour, set))
+        image.load() # Decode it now and close the file
+        IMAGES[key] = image
+    return IMAGES[key]
+
+def get_size(image_size: tuple, scale) -> tuple:
+    """
+    Returns the size (rounded to the nearest int) of the image after it
+    has been scaled.
+    """
+    if isinstance(scale, tuple):
+        width, height = scale
+    else:
+        width, height = image_size[0]*scale, image_size[1]*scale
+    return (int(width+0.5), int(height+0.5))
+
+def get_sprite(name: str, colour: bool, set: int, size_of_squares: int,
+               scale, master: tk.Misc=None) -> ImageTk.PhotoImage:
+    """
+    Returns the sprite ready to be used by tkinter. It is only created
+    the first time it is needed.
+    """
+    key = (set, name, colour, size_of_squares, scale)
+    if key not in SPRITES:
+        image = get_image(name, colour, set)
+        image = image.resize(get_size(image.size, scale), Image.NEAREST)
+        SPRITES[key] = ImageTk.PhotoImage(image, master=master)
+    return SPRITES[key]
+
+def load_sprites(master: tk.Misc, set: int=None, size_of_squares: int=None,
+                 scale: float=None) -> None:
+    """
+    Loads all of the sprites. Call it once at the start (after the
+    tkinter window has been created) so that redrawing the board never
+    has to read or decode any images.
+    """
+    if set is None:
+        set = SETTINGS.chess_pieces_set_number
+    if size_of_squares is None:
+        size_of_squares = SETTINGS.size_of_squares
+    if scale is None:
+        scale = SETTINGS.scale_for_pieces
+    for name in NAMES:
+        for colour in (True, False):
+            get_sprite(name, colour, set, size_of_squares, scale, master)
 
 
 class Piece(SuperClass):
@@ -16,31 +89,47 @@ class Piece(SuperClass):
         self.colour = colour
         self.master = master
         self.tkcanvasnum = None
+        self.tkimage = None
+        # True if the piece isn't centred on its square (it is being dragged)
+        self.placed = False
         self.position = position
         self.sqr_size = SETTINGS.size_of_squares
-        filename = self.get_filename(name, colour,
-                                     SETTINGS.chess_pieces_set_number)
-        self.image = Image.open(filename)
-        self.size = self.image.size
+        self.set = SETTINGS.chess_pieces_set_number
+        self.scale = 1
+
+    @property
+    def image(self) -> Image.Image:
+        return get_image(self.name, self.colour, self.set)
+
+    @property
+    def size(self) -> tuple:
+        if isinstance(self.scale, tuple):
+            return self.scale
+        w, h = self.image.size
+        return (w*self.scale, h*self.scale)
 
     def get_filename(self, name: str, colour: bool, set: int) -> str:
-        """
-        Gets the filename for the sprite file based on the name, colour,
-        and set number
-        """
-        if colour:
-            colour = "white"
-        else:
-            colour = "black"
-        return SPRITES_LOCATION+"set."+str(set)+"/"+name+"."+colour+".png"
+        return get_filename(name, colour, set)
+
+    def get_sprite(self) -> ImageTk.PhotoImage:
+        return get_sprite(self.name, self.colour, self.set, self.sqr_size,
+                          self.scale, self.master)
 
     def place(self, coords: tuple) -> None:
         """
         Displays the piece on the tkinter canvas at `coords` where `coords`
-        is a tuple of tkinter canvas coords
+        is a tuple of tkinter canvas coords. If the piece is already on the
+        canvas its sprite is moved (and put above everything else).
         """
-        self.tkimage = ImageTk.PhotoImage(self.image)
-        self.tkcanvasnum = self.master.create_image(coords, image=self.tkimage)
+        if self.tkcanvasnum is None:
+            self.tkimage = self.get_sprite()
+            self.tkcanvasnum = self.master.create_image(coords,
+                                                        image=self.tkimage,
+                                                        tags=PIECE_TAG)
+        else:
+            self.master.coords(self.tkcanvasnum, coords)
+            self.master.tag_raise(self.tkcanvasnum)
+        self.placed = True
 
     def show(self) -> None:
         """
@@ -49,8 +138,12 @@ class Piece(SuperClass):
         x, y = self.position
         # Centre the image in the square:
         pos = ((x-0.5)*self.sqr_size, (8.5-y)*self.sqr_size)
-        self.tkimage = ImageTk.PhotoImage(self.image)
-        self.tkcanvasnum = self.master.create_image(pos, image=self.tkimage)
+        if self.tkcanvasnum is None:
+            self.place(pos)
+        else:
+            # Just move the sprite that is already on the canvas
+            self.master.coords(self.tkcanvasnum, pos)
+        self.placed = False
 
     def destroy(self) -> None:
         """
@@ -59,6 +152,7 @@ class Piece(SuperClass):
         # Make sure that the sprite is actually on the screen
         if self.tkcanvasnum is not None:
             self.master.delete(self.tkcanvasnum)
+            self.tkcanvasnum = None
 
     def resize(self, scale=None, height=None, width=None) -> None:
         """
@@ -80,28 +174,20 @@ class Piece(SuperClass):
         elif height is None:
             # Only the width is given
             w, h = self.size
-            self.size = (width, width*h/w)
+            self.scale = (width, width*h/w)
         elif width is None:
             # Only the height is given
             w, h = self.size
-            self.size = (height*w/h, height)
+            self.scale = (height*w/h, height)
         else:
             # Both the width and height are given
-            self.size = (width, height)
-        self._resize()
-
-    def _resize(self) -> None:
-        """
-        Applies all resizing changes to the sprite.
-        Note it rounds all of the sizes
-        """
-        # Round the size to the nearest int:
-        size = (int(self.size[0]+0.5), int(self.size[1]+0.5))
-        self.image = self.image.resize(size, Image.NEAREST)
+            self.scale = (width, height)
 
     def resize_scale(self, scale: float) -> None:
         """
         Resizes the sprite based on the scale that it is given.
         """
-        self.size = (self.size[0]*scale, self.size[1]*scale)
-        self._resize()
+        if isinstance(self.scale, tuple):
+            self.scale = (self.scale[0]*scale, self.scale[1]*scale)
+        else:
+            self.scale *= scale
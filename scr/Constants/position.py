@@ -25,6 +25,8 @@ SIZE = Settings().gameboard.size_of_squares
 
 
 class Move:
+    __slots__ = ("position1", "position2")
+
     def __init__(self, position1, position2):
         self.position1 = position1
         self.position2 = position2
@@ -33,13 +35,36 @@ class Move:
         return self.position1.to_place() + self.position2.to_place()
 
     def __hash__(self) -> int:
-        return int(str(self.position1.to_int())+str(self.position2.to_int()))
+        return self.position1.to_int()*64+self.position2.to_int()
+
+
+def _to_coords(x: int, y: int) -> tuple:
+    return (int((x-0.5)*SIZE+0.5), int((8.5-y)*SIZE+0.5))
+
+def _to_coords_start(x: int, y: int) -> tuple:
+    return (int((x-1)*SIZE+0.5), int((8-y)*SIZE+0.5))
+
+def _to_coords_end(x: int, y: int) -> tuple:
+    return (int((x)*SIZE+0.5), int((9-y)*SIZE+0.5))
+
+def _to_place(x: int, y: int) -> str:
+    return chess.FILE_NAMES[x-1]+str(y)
+
+def _to_colour(x: int, y: int) -> bool:
+    return (x+y)%2 == 0 # True for the dark squares
 
 
 class Position:
+    __slots__ = ("x", "y", "i")
+
     def __init__(self, x: int, y: int):
         self.x = x
         self.y = y
+        # The index into the lookup tables if the position is on the board
+        if (1 <= x <= 8) and (1 <= y <= 8):
+            self.i = 8*y+x-9
+        else:
+            self.i = None
 
     def __add__(self, other) -> Move:
         if isinstance(other, self.__class__):
@@ -55,8 +80,11 @@ class Position:
             raise ValueError(repr(other)+"has to be an instance of: <int>")
 
     def __eq__(self, other):
-        return isinstance(other, self.__class__) and (self.x == other.x)\
-               and (self.y == other.y)
+        return (self is other) or (isinstance(other, self.__class__) and \
+               (self.x == other.x) and (self.y == other.y))
+
+    def __hash__(self) -> int:
+        return 8*self.y+self.x-9
 
     def __repr__(self) -> str:
         return f"<Position object at {hex(id(self))} x={self.x} y={self.y}>"
@@ -72,31 +100,56 @@ class Position:
                                  "for x or y not "+str(key))
 
     def __int__(self) -> int:
-        return self.to_int()
+        return 8*self.y+self.x-9
 
     def to_coords(self) -> tuple:
-        return (int((self.x-0.5)*SIZE+0.5), int((8.5-self.y)*SIZE+0.5))
+        if self.i is None:
+            return _to_coords(self.x, self.y)
+        return COORDS[self.i]
 
     def to_coords_start(self) -> tuple:
-        return (int((self.x-1)*SIZE+0.5), int((8-self.y)*SIZE+0.5))
+        if self.i is None:
+            return _to_coords_start(self.x, self.y)
+        return COORDS_START[self.i]
 
     def to_coords_end(self) -> tuple:
-        return (int((self.x)*SIZE+0.5), int((9-self.y)*SIZE+0.5))
+        if self.i is None:
+            return _to_coords_end(self.x, self.y)
+        return COORDS_END[self.i]
 
     def to_place(self) -> str:
-        return chess.FILE_NAMES[self.x-1]+str(self.y)
+        if self.i is None:
+            return _to_place(self.x, self.y)
+        return PLACES[self.i]
 
     def to_int(self) -> int:
         return 8*self.y+self.x-9
 
     def to_colour(self) -> bool:
-        return bool(int(self.to_place(), 35)%2) # Converts to base 35 first.
+        if self.i is None:
+            return _to_colour(self.x, self.y)
+        return COLOURS[self.i]
 
     @classmethod
     def from_coords(cls, coords: tuple):
         x, y = coords
-        return cls(int(x//SIZE+1+0.5), int((SIZE*8-y)//SIZE+1+0.5))
+        x, y = int(x//SIZE+1+0.5), int((SIZE*8-y)//SIZE+1+0.5)
+        if (1 <= x <= 8) and (1 <= y <= 8):
+            return POSITIONS[8*y+x-9]
+        # Outside of the board so it can't be one of `POSITIONS`
+        return cls(x, y)
 
     @classmethod
     def from_int(cls, _int: int):
-        return cls(_int%8+1, _int//8+1)
+        return POSITIONS[_int]
+
+
+# Work out everything for the 64 squares once. `Position.from_int` and
+# `Position.from_coords` return the same objects every time so nothing
+# is created when the mouse moves or when the board is redrawn.
+POSITIONS = tuple(Position(i%8+1, i//8+1) for i in range(64))
+COORDS = tuple(_to_coords(p.x, p.y) for p in POSITIONS)
+COORDS_START = tuple(_to_coords_start(p.x, p.y) for p in POSITIONS)
+COORDS_END = tuple(_to_coords_end(p.x, p.y) for p in POSITIONS)
+PLACES = tuple(_to_place(p.x, p.y) for p in POSITIONS)
+COLOURS = tuple(_to_colour(p.x, p.y) for p in POSITIONS)
@@ -295,6 +295,15 @@ computer:
     # In seconds
     "time" = 2
 
+ai:
+    # The size of the transposition table in MB
+    "transposition_table_mb" = 16
+    # The number of processes used to search. None means 1 per CPU core
+    "workers" = None
+    # The AI's clock for the whole game and the increment (in seconds)
+    "clock" = 300
+    "increment" = 2
+
 root:
     "background" = "grey"
 
@@ -306,17 +315,27 @@ evaluation:
     "font" = ("Lucida Console", 20)
     "stockfish" = "Stockfish/stockfish_11_x"
     "ai" = "ccarotmodule/ccarotmodule"
+    # The number of Stockfish processes that are kept running
+    "engine_pool_size" = 2
+    "engine_hash_mb" = 16
+    # The number of lines (best moves) that are analysed
+    "multipv" = 1
+    # Positions that were already analysed are kept in a cache (in MB)
+    "cache_mb" = 8
+    # Only show cached lines straight away if they are this deep
+    "cache_min_depth" = 12
 
 suggested_moves:
     "width" = 160
-    "height" = 30
+    # 2 lines: the analysis and the moves from the open PGN database
+    "height" = 45
     "colour" = "white"
     "background" = "grey"
     "font" = ("Lucida Console", 10)
 
 move_history:
     "width" = 160
-    "height" = 380
+    "height" = 365
     "line_width" = 19
     "line_height" = 30
     "auto_hide_scrollbar" = True
@@ -0,0 +1,142 @@
+"""
+This is the evaluation function used by the built in search engine. It
+works straight on the 64 bit integer bitboards that `chess.Board` keeps
+for every piece type and colour.
+
+The piece values are read from the `*_EVAL.txt` files that are shipped
+in `ccarotmodule/Data/`. Each file can eather have:
+    1 number    The value of the piece (in pawns) on any square
+    64 numbers  A piece-square table (in pawns) from A8 to H1 as seen
+                from white's side of the board
+All scores are returned in centipawns from the side to move's point of view.
+"""
+
+
+import chess
+import os
+
+
+DATA_FOLDER = "ccarotmodule/Data/"
+FILENAMES = {chess.PAWN: "PAWN_EVAL.txt",
+             chess.KNIGHT: "KNIGHT_EVAL.txt",
+             chess.BISHOP: "BISHOP_EVAL.txt",
+             chess.ROOK: "ROOK_EVAL.txt",
+             chess.QUEEN: "QUEEN_EVAL.txt"}
+# Used if one of the files above is missing
+DEFAULT_VALUES = {chess.PAWN: 1,
+                  chess.KNIGHT: 3,
+                  chess.BISHOP: 3,
+                  chess.ROOK: 5,
+                  chess.QUEEN: 9,
+                  chess.KING: 0}
+
+# Small positional bonuses (in centipawns) that are added on top of the
+# tables. They are just masks so they cost 1 popcount each.
+CENTRE_BONUS = {chess.PAWN: 20, chess.KNIGHT: 15, chess.BISHOP: 5}
+RIM_PENALTY = {chess.KNIGHT: 20}
+BB_RIM = chess.BB_FILE_A | chess.BB_FILE_H | chess.BB_RANK_1 | chess.BB_RANK_8
+BB_EXTENDED_CENTRE = 0x00003C3C3C3C0000
+
+
+def load_table(filename: str, default: int) -> tuple:
+    """
+    Reads a table from `filename` and returns a tuple of 64 ints (in
+    centipawns) indexed by `chess.Square` for a white piece. If the file
+    doesn't exist it returns a table full of `default` pawns.
+    """
+    if os.path.exists(filename):
+        with open(filename, "r") as file:
+            values = [float(value) for value in file.read().split()]
+    else:
+        values = []
+    if len(values) == 0:
+        values = [default]
+    if len(values) == 1:
+        return (int(values[0]*100),)*64
+    if len(values) != 64:
+        raise ValueError("The table in "+filename+" must have 1 or 64 values")
+    # The file is written from A8 to H1 so we need to flip the ranks
+    return tuple(int(values[chess.square_mirror(square)]*100)
+                 for square in chess.SQUARES)
+
+
+class Evaluation:
+    def __init__(self, folder: str=DATA_FOLDER):
+        self.tables = {}
+        self.uniform = {}
+        for piece_type in chess.PIECE_TYPES:
+            if piece_type in FILENAMES:
+                filename = os.path.join(folder, FILENAMES[piece_type])
+            else:
+                filename = ""
+            table = load_table(filename, DEFAULT_VALUES[piece_type])
+            self.tables[piece_type] = table
+            # If all of the values are the same we can just use popcount
+            if len(set(table)) == 1:
+                self.uniform[piece_type] = table[0]
+            else:
+                self.uniform[piece_type] = None
+        # The most that each piece can be worth (used by the delta pruning
+        # in `Engine/search.py`)
+        self.values = {piece_type: max(table)
+                       for piece_type, table in self.tables.items()}
+
+    def __call__(self, board: chess.Board) -> int:
+        return self.evaluate(board)
+
+    def evaluate(self, board: chess.Board) -> int:
+        """
+        Returns the score of the board in centipawns from the point of
+        view of the side that has to move.
+        """
+        score = 0
+        white = board.occupied_co[chess.WHITE]
+        black = board.occupied_co[chess.BLACK]
+        for piece_type in chess.PIECE_TYPES:
+            pieces = board.pieces_mask(piece_type, chess.WHITE)
+            pieces = pieces | board.pieces_mask(piece_type, chess.BLACK)
+            if not pieces:
+                continue
+            white_pieces = pieces & white
+            black_pieces = pieces & black
+            value = self.uniform[piece_type]
+            if value is None:
+                table = self.tables[piece_type]
+                score += self.sum_table(table, white_pieces, False)
+                score -= self.sum_table(table, black_pieces, True)
+            else:
+                score += value*(chess.popcount(white_pieces)-\
+                                chess.popcount(black_pieces))
+            score += self.positional(piece_type, white_pieces, black_pieces)
+        if board.turn == chess.WHITE:
+            return score
+        return -score
+
+    def sum_table(self, table: tuple, bitboard: int, mirror: bool) -> int:
+        """
+        Adds up the values of `table` for every bit set in `bitboard`.
+        """
+        score = 0
+        while bitboard:
+            square = (bitboard & -bitboard).bit_length()-1
+            if mirror:
+                square ^= 0x38 # Same as `chess.square_mirror`
+            score += table[square]
+            bitboard &= bitboard-1
+        return score
+
+    def positional(self, piece_type: int, white: int, black: int) -> int:
+        """
+        Gives a small bonus for pieces in the centre and a small penalty
+        for knights on the rim.
+        """
+        score = 0
+        if piece_type in CENTRE_BONUS:
+            bonus = CENTRE_BONUS[piece_type]
+            score += bonus*(chess.popcount(white & BB_EXTENDED_CENTRE)-\
+                            chess.popcount(black & BB_EXTENDED_CENTRE))
+        if piece_type in RIM_PENALTY:
+            penalty = RIM_PENALTY[piece_type]
+            score -= penalty*(chess.popcount(white & BB_RIM)-\
+                              chess.popcount(black & BB_RIM))
+        return score
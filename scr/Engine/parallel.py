@@ -0,0 +1,172 @@
+"""
+This is a Lazy SMP version of `Search`. It starts a pool of worker
+processes (threads wouldn't help because of the GIL) that all search the
+same root position. They share one transposition table that lives in
+`multiprocessing.shared_memory` so the workers help each other by filling
+the table. The helper workers skip some of the iterative deepening depths
+(see `Engine/search.skip_depth`) so that they don't all do exactly the
+same work, even when all of them are given the same depth and timer.
+When the first worker finishes (or the hard time limit is reached), all
+of the others are stopped and the result from the deepest completed
+search is used.
+Use:
+    search = ParallelSearch(workers=4)
+    move, score = search.search(chess.Board(), depth=4)
+    search.close()
+"""
+
+
+from multiprocessing import shared_memory
+import multiprocessing
+import queue
+import chess
+
+from .transposition import TranspositionTable, size_in_bytes
+from .evaluation import Evaluation, DATA_FOLDER
+from .search import Search, MAX_DEPTH
+from .timemanager import MoveTimer
+from .tables import get_tables
+
+
+# These are only used inside of the worker processes
+_memory = None
+_search = None
+
+
+def _init_worker(memory_name: str, stop_event, data_folder: str) -> None:
+    """
+    Runs once in each worker process. It attaches to the shared
+    transposition table.
+    """
+    global _memory, _search
+    _memory = shared_memory.SharedMemory(name=memory_name)
+    table = TranspositionTable(buffer=_memory.buf)
+    # The tablebase files are memory mapped so all of the workers share
+    # the same pages
+    _search = Search(Evaluation(data_folder), table, get_tables())
+    _search.stop_event = stop_event
+
+def _search_worker(fen: str, moves: list, depth: int, generation: int,
+                   time_limits: tuple, helper: int) -> tuple:
+    """
+    Searches the position after `moves` (in uci format) from `fen` and
+    returns `(depth, move, score)` where `depth` is the last depth that
+    was fully searched and `move` is in uci format. The moves are needed
+    so that the search can see repetitions of the game's positions.
+    `time_limits` is eather None or `(soft, hard)` in seconds and `helper`
+    is the worker's number (0 is the main worker).
+    """
+    # All of the workers must use the same table generation
+    _search.table.generation = generation
+    timer = None
+    if time_limits is not None:
+        timer = MoveTimer(*time_limits)
+    board = chess.Board(fen)
+    for move in moves:
+        board.push(chess.Move.from_uci(move))
+    move, score = _search.search(board, depth, timer, helper)
+    if move is None:
+        return _search.depth, None, score
+    return _search.depth, move.uci(), score
+
+
+class ParallelSearch:
+    def __init__(self, workers: int, table_size: float=16,
+                 data_folder: str=DATA_FOLDER):
+        self.workers = workers
+        self.table_size = table_size
+        self.data_folder = data_folder
+        self.generation = 0
+        self.depth = 0
+        self.pool = None
+        self.memory = None
+        self.table = None
+        self.finished = queue.Queue()
+        # Use spawn on all OSs because forking a process with tkinter
+        # and threads running isn't safe
+        self.context = multiprocessing.get_context("spawn")
+        self.stop_event = self.context.Event()
+
+    def start(self) -> None:
+        """
+        Creates the shared transposition table and starts the workers.
+        This is done the first time `search` is called.
+        """
+        if self.pool is not None:
+            return None
+        size = size_in_bytes(self.table_size)
+        self.memory = shared_memory.SharedMemory(create=True, size=size)
+        self.table = TranspositionTable(buffer=self.memory.buf)
+        initargs = (self.memory.name, self.stop_event, self.data_folder)
+        self.pool = self.context.Pool(self.workers, initializer=_init_worker,
+                                      initargs=initargs)
+
+    def search(self, board: chess.Board, depth: int=MAX_DEPTH,
+               timer: MoveTimer=None) -> tuple:
+        """
+        Same as `Search.search` but uses all of the workers. Returns
+        `(move, score)`.
+        """
+        self.start()
+        self.stop_event.clear()
+        self.generation = (self.generation+1) & 63
+        fen = board.root().fen()
+        moves = [move.uci() for move in board.move_stack]
+        time_limits = None
+        if timer is not None:
+            time_limits = timer.remaining()
+        jobs = []
+        for i in range(self.workers):
+            args = (fen, moves, depth, self.generation, time_limits, i)
+            job = self.pool.apply_async(_search_worker, args,
+                                        callback=self.finished.put,
+                                        error_callback=self.finished.put)
+            jobs.append(job)
+
+        # Wait for the first worker to finish and stop the rest. The
+        # workers check the time themselves but we make sure that the
+        # hard limit is kept.
+        results = []
+        timeout = None
+        if timer is not None:
+            timeout = timer.remaining()[1]
+        try:
+            results.append(self.finished.get(timeout=timeout))
+        except queue.Empty:
+            pass
+        self.stop_event.set()
+        for job in jobs:
+            job.wait()
+        while len(results) < len(jobs):
+            results.append(self.finished.get())
+
+        best_depth, best_move, best_score = 0, None, 0
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+            completed_depth, move, score = result
+            if (move is not None) and (completed_depth > best_depth):
+                best_depth, best_move, best_score = result
+        self.depth = best_depth
+        if best_move is None:
+            return None, best_score
+        return chess.Move.from_uci(best_move), best_score
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def close(self) -> None:
+        """
+        Stops the workers and frees the shared transposition table.
+        """
+        self.stop()
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        if self.memory is not None:
+            self.table.release()
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+            self.table = None
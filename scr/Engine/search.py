@@ -0,0 +1,347 @@
+"""
+This is the built in search engine used by the AI player. It is an
+alpha-beta (negamax) search with iterative deepening, a quiescence search,
+a transposition table and simple move ordering (hash move, MVV-LVA
+captures and killer moves). If it is given the endgame tablebase (see
+`Engine/tables.py`) it uses it for positions with few pieces.
+Use:
+    search = Search()
+    move, score = search.search(chess.Board(), depth=4)
+or with a time limit (see `Engine/timemanager.py`):
+    move, score = search.search(chess.Board(), timer=MoveTimer(1, 2))
+"""
+
+
+import chess.polyglot
+import chess
+
+from .evaluation import Evaluation
+from .transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+
+MATE_SCORE = 100000
+INFINITY = MATE_SCORE+1
+# Anything with a bigger absolute value is a forced mate
+MATE_THRESHOLD = MATE_SCORE-1000
+MAX_PLY = 128
+# The score for a tablebase win. It is below the mate scores so it isn't
+# treated as a forced mate.
+TB_WIN_SCORE = MATE_THRESHOLD-2*MAX_PLY
+MAX_DEPTH = 64
+# How often (in nodes) `Search.check_stop` is called
+CHECK_EVERY = 256
+# Stop early if the best move didn't change for this many iterations
+STABLE_ITERATIONS = 4
+# Captures in the quiescence search that can't bring the score up to
+# alpha even with this much (in centipawns) on top are skipped
+DELTA_MARGIN = 200
+# The depths that the helper workers in `Engine/parallel.py` skip (the
+# same pattern as the Lazy SMP in Stockfish 9). Helper `i` skips a depth
+# if `((depth+SKIP_PHASE[j])//SKIP_SIZE[j])%2 == 1` where `j = (i-1)%20`
+# so the workers are on different depths at the same time.
+SKIP_SIZE = (1, 1, 2, 2, 2, 2, 3, 3, 3, 3, 3, 3, 4, 4, 4, 4, 4, 4, 4, 4)
+SKIP_PHASE = (0, 1, 0, 1, 2, 3, 0, 1, 2, 3, 4, 5, 0, 1, 2, 3, 4, 5, 6, 7)
+
+
+def skip_depth(helper: int, depth: int) -> bool:
+    """
+    Returns True if the helper worker `helper` (0 is the main search which
+    never skips) should skip the iteration at `depth`.
+    """
+    if (helper == 0) or (depth == 1):
+        return False
+    i = (helper-1)%len(SKIP_SIZE)
+    return ((depth+SKIP_PHASE[i])//SKIP_SIZE[i])%2 == 1
+
+
+def score_to_table(score: int, ply: int) -> int:
+    """
+    Mate scores are stored as the distance from the position not from
+    the root.
+    """
+    if score > MATE_THRESHOLD:
+        return score+ply
+    if score < -MATE_THRESHOLD:
+        return score-ply
+    return score
+
+def score_from_table(score: int, ply: int) -> int:
+    if score > MATE_THRESHOLD:
+        return score-ply
+    if score < -MATE_THRESHOLD:
+        return score+ply
+    return score
+
+
+class Search:
+    def __init__(self, evaluation: Evaluation=None,
+                 table: TranspositionTable=None, tables=None):
+        if evaluation is None:
+            evaluation = Evaluation()
+        if table is None:
+            table = TranspositionTable()
+        self.evaluation = evaluation
+        self.table = table
+        # `Engine/tables.Tables` or None
+        self.tables = tables
+        self.nodes = 0
+        self.depth = 0
+        self.stopped = False
+        # Can be set to a `threading.Event` or `multiprocessing.Event` that
+        # stops the search when set
+        self.stop_event = None
+        # A `MoveTimer` that limits the time of the current search
+        self.timer = None
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+
+    def search(self, board: chess.Board, depth: int=MAX_DEPTH,
+               timer=None, helper: int=0) -> tuple:
+        """
+        Searches the board up to `depth` plies using iterative deepening
+        and returns `(move, score)`. The board isn't changed.
+        If `timer` (a `MoveTimer`) is given the search stops when it runs
+        out of time or if the best move is stable for a few iterations.
+        If there aren't any legal moves the move will be None.
+        `helper` is only used by `Engine/parallel.py` (see `skip_depth`).
+        """
+        # Keep the move stack so that repetitions of the game's positions
+        # are seen as draws
+        board = board.copy()
+        self.nodes = 0
+        self.depth = 0
+        self.stopped = False
+        self.timer = timer
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.table.new_search()
+        best_move, best_score = None, -INFINITY
+        stable = 0
+        for current_depth in range(1, depth+1):
+            if skip_depth(helper, current_depth) and (current_depth < depth):
+                continue
+            move, score = self.search_root(board, current_depth, best_move)
+            if self.stopped:
+                break
+            if move == best_move:
+                stable += 1
+            else:
+                stable = 0
+            best_move, best_score = move, score
+            self.depth = current_depth
+            # No need to search deeper if we found a forced mate
+            if abs(best_score) > MATE_THRESHOLD:
+                break
+            if timer is not None:
+                if not timer.can_start_iteration():
+                    break
+                if (stable >= STABLE_ITERATIONS) and \
+                   (timer.elapsed() > timer.soft/4):
+                    break
+        self.timer = None
+        return best_move, best_score
+
+    def search_root(self, board: chess.Board, depth: int,
+                    first_move: chess.Move) -> tuple:
+        """
+        Searches all of the moves from the root and returns the best one
+        and its score. `first_move` is searched first (usually the best
+        move from the last iteration).
+        """
+        alpha, beta = -INFINITY, INFINITY
+        best_move = None
+        key = chess.polyglot.zobrist_hash(board)
+        if first_move is None:
+            entry = self.table.probe(key)
+            if entry is not None:
+                first_move = entry[3]
+        for move in self.ordered_moves(board, 0, first_move):
+            board.push(move)
+            score = -self.negamax(board, depth-1, -beta, -alpha, 1)
+            board.pop()
+            if self.stopped:
+                break
+            if (best_move is None) or (score > alpha):
+                alpha = score
+                best_move = move
+        if (not self.stopped) and (best_move is not None):
+            self.table.store(key, depth, EXACT, alpha, best_move)
+        return best_move, alpha
+
+    def negamax(self, board: chess.Board, depth: int, alpha: int,
+                beta: int, ply: int) -> int:
+        """
+        The main alpha-beta search. Returns the score of the board from the
+        point of view of the side that has to move.
+        """
+        if depth <= 0:
+            return self.quiescence(board, alpha, beta, ply)
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0:
+            self.check_stop()
+        if board.is_insufficient_material() or board.is_repetition(2):
+            return 0
+
+        key = chess.polyglot.zobrist_hash(board)
+        hash_move = None
+        entry = self.table.probe(key)
+        if entry is not None:
+            entry_depth, bound, score, hash_move = entry
+            if entry_depth >= depth:
+                score = score_from_table(score, ply)
+                if (bound == EXACT) or \
+                   ((bound == LOWER) and (score >= beta)) or \
+                   ((bound == UPPER) and (score <= alpha)):
+                    return score
+
+        # The tablebase assumes that the 50 move counter is 0 so only use
+        # it right after a capture or a pawn move
+        if (self.tables is not None) and (board.halfmove_clock == 0):
+            wdl = self.tables.probe_wdl(board)
+            if wdl is not None:
+                if wdl == 2:
+                    score = TB_WIN_SCORE-ply
+                elif wdl == -2:
+                    score = -TB_WIN_SCORE+ply
+                else:
+                    score = 0 # Draws (or wins that the 50 move rule stops)
+                self.table.store(key, MAX_DEPTH, EXACT, score, None)
+                return score
+
+        original_alpha = alpha
+        best_move = None
+        any_moves = False
+        for move in self.ordered_moves(board, ply, hash_move):
+            any_moves = True
+            board.push(move)
+            score = -self.negamax(board, depth-1, -beta, -alpha, ply+1)
+            board.pop()
+            if self.stopped:
+                return 0
+            if score >= beta:
+                if not board.is_capture(move):
+                    self.add_killer(move, ply)
+                self.table.store(key, depth, LOWER, score_to_table(beta, ply),
+                                 move)
+                return beta
+            if score > alpha:
+                alpha = score
+                best_move = move
+
+        if not any_moves:
+            if board.is_check():
+                return -MATE_SCORE+ply # Checkmate
+            return 0 # Stalemate
+        if alpha > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER
+        self.table.store(key, depth, bound, score_to_table(alpha, ply),
+                         best_move)
+        return alpha
+
+    def quiescence(self, board: chess.Board, alpha: int, beta: int,
+                   ply: int) -> int:
+        """
+        Only searches the captures so that we don't stop the search in the
+        middle of an exchange.
+        """
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0:
+            self.check_stop()
+        if self.stopped:
+            return 0
+        stand_pat = self.evaluation(board)
+        if stand_pat >= beta:
+            return beta
+        if stand_pat > alpha:
+            alpha = stand_pat
+        if ply >= MAX_PLY-1:
+            return alpha
+
+        values = self.evaluation.values
+        for move in self.ordered_captures(board):
+            # Delta pruning (promotions can gain a lot more)
+            if move.promotion is None:
+                victim = board.piece_type_at(move.to_square) or chess.PAWN
+                if stand_pat+values[victim]+DELTA_MARGIN <= alpha:
+                    continue
+            board.push(move)
+            score = -self.quiescence(board, -beta, -alpha, ply+1)
+            board.pop()
+            if self.stopped:
+                return 0
+            if score >= beta:
+                return beta
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def ordered_moves(self, board: chess.Board, ply: int,
+                      first_move: chess.Move=None) -> list:
+        """
+        Returns the legal moves sorted so that the best looking moves
+        are searched first:
+            `first_move`, captures (MVV-LVA), promotions, killers, the rest
+        """
+        killers = self.killers[min(ply, MAX_PLY-1)]
+        scored = []
+        for move in board.generate_legal_moves():
+            if move == first_move:
+                score = 1000000
+            elif board.is_capture(move):
+                score = 100000+self.mvv_lva(board, move)
+            elif move.promotion is not None:
+                score = 90000+move.promotion
+            elif move in killers:
+                score = 80000
+            else:
+                score = 0
+            scored.append((score, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def ordered_captures(self, board: chess.Board) -> list:
+        captures = list(board.generate_legal_captures())
+        captures.sort(key=lambda move: self.mvv_lva(board, move),
+                      reverse=True)
+        return captures
+
+    def mvv_lva(self, board: chess.Board, move: chess.Move) -> int:
+        """
+        Most valuable victim - least valuable attacker.
+        """
+        victim = board.piece_type_at(move.to_square)
+        if victim is None: # En passant
+            victim = chess.PAWN
+        attacker = board.piece_type_at(move.from_square)
+        return 10*victim-attacker
+
+    def add_killer(self, move: chess.Move, ply: int) -> None:
+        killers = self.killers[min(ply, MAX_PLY-1)]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+    def check_stop(self) -> None:
+        """
+        Called every `CHECK_EVERY` nodes to see if the search should stop.
+        """
+        if (self.stop_event is not None) and self.stop_event.is_set():
+            self.stopped = True
+        # Always finish depth 1 so that we have a move to play
+        if (self.timer is not None) and (self.depth > 0) and \
+           self.timer.out_of_time():
+            self.stopped = True
+
+    def stop(self) -> None:
+        """
+        Stops the search as soon as possible. `Search.search` will return
+        the best move from the last fully searched depth.
+        """
+        self.stopped = True
+
+    def close(self) -> None:
+        """
+        Frees everything the search is using. There is nothing to free
+        here but `ParallelSearch` needs to stop its processes.
+        """
+        self.stop()
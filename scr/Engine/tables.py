@@ -0,0 +1,231 @@
+"""
+This opens the endgame tablebase (Syzygy) and the opening book (Polyglot)
+once for the whole process. Both of them are memory mapped by
+python-chess so the files are only read when they are needed and the
+pages are shared (read only) by all of the processes that open them,
+like the workers in `Engine/parallel.py`.
+Use:
+    tables = get_tables()
+    move = tables.book_move(board)  # None if not in the book
+    wdl = tables.probe_wdl(board)   # None if not in the tablebase
+    dtz = tables.probe_dtz(board)
+    moves = tables.probe_root(board) # [(move, wdl, dtz), ...] best first
+If a file (or folder) doesn't exist the probes just return None.
+"""
+
+
+import threading
+import os
+
+import chess.polyglot
+import chess.syzygy
+import chess
+
+
+SYZYGY_FOLDER = "Tables/syzygy/"
+POLYGLOT_FILE = "Tables/polyglot.bin"
+
+_tables = None
+_tables_lock = threading.Lock()
+
+
+class Tables:
+    def __init__(self, syzygy_folder: str=SYZYGY_FOLDER,
+                 polyglot_file: str=POLYGLOT_FILE):
+        self.syzygy_folder = syzygy_folder
+        self.polyglot_file = polyglot_file
+        self.lock = threading.Lock()
+        self._tablebase = None
+        self._book = None
+        self.opened_tablebase = False
+        self.opened_book = False
+        # The most pieces (including kings) that the tablebase has
+        self.max_pieces = 0
+
+    @property
+    def tablebase(self) -> chess.syzygy.Tablebase:
+        """
+        The tablebase (or None if there isn't one). It is opened the first
+        time it is needed.
+        """
+        if not self.opened_tablebase:
+            with self.lock:
+                if not self.opened_tablebase:
+                    self.open_tablebase()
+        return self._tablebase
+
+    @property
+    def book(self) -> chess.polyglot.MemoryMappedReader:
+        """
+        The opening book (or None if there isn't one). It is opened the
+        first time it is needed.
+        """
+        if not self.opened_book:
+            with self.lock:
+                if not self.opened_book:
+                    self.open_book()
+        return self._book
+
+    def open_tablebase(self) -> None:
+        if os.path.isdir(self.syzygy_folder):
+            tablebase = chess.syzygy.open_tablebase(self.syzygy_folder)
+            if len(tablebase.wdl) > 0:
+                # The names are like "KQvKR"
+                self.max_pieces = max(len(name)-1 for name in tablebase.wdl)
+                self._tablebase = tablebase
+            else:
+                tablebase.close()
+        self.opened_tablebase = True
+
+    def open_book(self) -> None:
+        if os.path.isfile(self.polyglot_file):
+            self._book = chess.polyglot.open_reader(self.polyglot_file)
+        self.opened_book = True
+
+    def in_tablebase(self, board: chess.Board) -> bool:
+        """
+        Returns True if the tablebase can have the board. It doesn't check
+        if the table file is there.
+        """
+        if self.tablebase is None:
+            return False
+        if board.castling_rights:
+            return False
+        return chess.popcount(board.occupied) <= self.max_pieces
+
+    def probe_wdl(self, board: chess.Board) -> int:
+        """
+        Returns the win/draw/loss (from -2 to 2) from the point of view of
+        the side to move or None.
+        """
+        if not self.in_tablebase(board):
+            return None
+        return self.tablebase.get_wdl(board)
+
+    def probe_dtz(self, board: chess.Board) -> int:
+        """
+        Returns the distance to zeroing (see python-chess) or None.
+        """
+        if not self.in_tablebase(board):
+            return None
+        return self.tablebase.get_dtz(board)
+
+    def probe_root(self, board: chess.Board) -> list:
+        """
+        Scores all of the legal moves and returns `[(move, wdl, dtz), ...]`
+        sorted so that the best move is first. `wdl` and `dtz` are from the
+        point of view of the side to move on `board` and `dtz` is the
+        number of plies until the 50 move counter is reset (positive if
+        we win). The wins are sorted by the smallest `dtz` and the losses
+        by the biggest so we win as fast as possible and lose as slowly as
+        possible. Returns [] if the tablebase doesn't have the board.
+        Probing the DTZ is slow so it is only done for the moves that can
+        be the best ones. The other moves have `dtz = None`.
+        """
+        if not self.in_tablebase(board):
+            return []
+        tablebase = self.tablebase
+        board = board.copy(stack=False)
+        # [move, wdl, dtz, zeroing, mate]
+        moves = []
+        for move in board.generate_legal_moves():
+            zeroing = board.is_zeroing(move)
+            board.push(move)
+            mate = board.is_checkmate()
+            if mate:
+                wdl = 2
+            else:
+                wdl = tablebase.get_wdl(board)
+                if wdl is None:
+                    return [] # A table is missing
+                wdl = -wdl
+            board.pop()
+            moves.append([move, wdl, None, zeroing, mate])
+
+        # Work out the DTZ of the best moves. If all of them turn out to
+        # be draws because of the 50 move rule try the next best ones.
+        for wdl in sorted({move[1] for move in moves}, reverse=True):
+            for move in moves:
+                if move[1] == wdl:
+                    if not self.root_dtz(board, tablebase, move):
+                        return [] # A table is missing
+            if any(move[1] == wdl for move in moves):
+                break
+
+        def key(move: list) -> tuple:
+            # Sort by: wdl, checkmate, fast wins and slow losses
+            dtz = move[2]
+            if dtz is None:
+                order = 2000
+            elif dtz < 0:
+                order = 1000+dtz
+            else:
+                order = dtz
+            return (-move[1], not move[4], order)
+        moves.sort(key=key)
+        return [(move, wdl, dtz) for move, wdl, dtz, _, _ in moves]
+
+    def root_dtz(self, board: chess.Board, tablebase, move: list) -> bool:
+        """
+        Sets the DTZ of the root move `move` (a list from `probe_root`).
+        Returns False if a table is missing.
+        """
+        _move, wdl, _, zeroing, mate = move
+        if wdl == 0:
+            dtz = 0
+        elif zeroing or mate:
+            dtz = 1 if wdl > 0 else -1
+        else:
+            board.push(_move)
+            child_dtz = tablebase.get_dtz(board)
+            board.pop()
+            if child_dtz is None:
+                return False
+            if wdl > 0:
+                dtz = abs(child_dtz)+1
+            else:
+                dtz = -abs(child_dtz)-1
+        move[2] = dtz
+        # A win that takes too long is a draw because of the 50 move rule
+        # (the tablebase thinks that the counter is 0)
+        if (not zeroing) and (board.halfmove_clock+abs(dtz) > 100):
+            if wdl == 2:
+                move[1] = 1
+            elif wdl == -2:
+                move[1] = -1
+        return True
+
+    def book_move(self, board: chess.Board) -> chess.Move:
+        if self.book is None:
+            return None
+        entry = self.book.get(board)
+        if entry is None:
+            return None
+        return entry.move
+
+    def close(self) -> None:
+        with self.lock:
+            if self._tablebase is not None:
+                self._tablebase.close()
+            if self._book is not None:
+                self._book.close()
+            self._tablebase = None
+            self._book = None
+            self.opened_tablebase = False
+            self.opened_book = False
+
+
+def get_tables() -> Tables:
+    """
+    Returns the tables that are shared by the whole process.
+    """
+    global _tables
+    with _tables_lock:
+        if _tables is None:
+            _tables = Tables()
+        return _tables
+
+def close_tables() -> None:
+    with _tables_lock:
+        if _tables is not None:
+            _tables.close()
@@ -0,0 +1,103 @@
+"""
+This decides how long the AI can think for each move. It keeps track of
+a game clock (like a chess clock with an increment) and gives each move
+a budget:
+    soft limit  Don't start a new iteration of the search after this
+    hard limit  Stop the search right away after this
+Use:
+    time_manager = TimeManager(clock=300, increment=2)
+    timer = time_manager.start_move()
+    move, score = search.search(board, timer=timer)
+    time_manager.end_move(timer)
+    time_manager.undo_move()    # Our last move was taken back
+    time_manager.reset()        # A new game started
+"""
+
+
+import time
+
+
+MOVES_TO_GO = 30 # How many more moves we expect to have to play
+MIN_MOVES_TO_GO = 10
+MOVE_OVERHEAD = 0.05 # Time (in seconds) lost for each move
+MIN_TIME = 0.05 # Never think for less than this
+
+
+class MoveTimer:
+    def __init__(self, soft: float, hard: float):
+        self.soft = soft
+        self.hard = hard
+        self.start = time.perf_counter()
+
+    def elapsed(self) -> float:
+        return time.perf_counter()-self.start
+
+    def out_of_time(self) -> bool:
+        """
+        Returns True if the search must stop right now.
+        """
+        return self.elapsed() >= self.hard
+
+    def can_start_iteration(self) -> bool:
+        """
+        The next iteration usually takes a lot longer than all of the
+        previous ones so only start it if it is likely to finish.
+        """
+        return self.elapsed() < self.soft/2
+
+    def remaining(self) -> tuple:
+        """
+        Returns the `(soft, hard)` time that is left.
+        """
+        elapsed = self.elapsed()
+        return max(self.soft-elapsed, 0), max(self.hard-elapsed, 0)
+
+
+class TimeManager:
+    def __init__(self, clock: float, increment: float=0):
+        """
+        `clock` is the total time (in seconds) for the game and `increment`
+        is the time added after each move.
+        """
+        self.start_clock = clock
+        self.increment = increment
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Call when a new game starts.
+        """
+        self.clock = self.start_clock
+        self.moves_played = 0
+        # The clock before each of our moves (so they can be undone)
+        self.clocks = []
+
+    def start_move(self) -> MoveTimer:
+        """
+        Call when we start thinking about a move.
+        """
+        moves_to_go = max(MOVES_TO_GO-self.moves_played//2, MIN_MOVES_TO_GO)
+        usable = max(self.clock-MOVE_OVERHEAD, 0)
+        soft = usable/moves_to_go+self.increment*0.75
+        # Never use more than a fifth of what is left in one move
+        hard = min(soft*3, usable/5+self.increment)
+        soft = max(min(soft, hard), MIN_TIME)
+        hard = max(hard, MIN_TIME)
+        return MoveTimer(soft, hard)
+
+    def end_move(self, timer: MoveTimer) -> None:
+        """
+        Call after we played the move. It takes the time off the clock
+        and adds the increment.
+        """
+        self.clocks.append(self.clock)
+        self.clock = max(self.clock-timer.elapsed(), 0)+self.increment
+        self.moves_played += 1
+
+    def undo_move(self) -> None:
+        """
+        Call when our last move was undone. It gives back the time it took.
+        """
+        if len(self.clocks) > 0:
+            self.clock = self.clocks.pop()
+            self.moves_played -= 1
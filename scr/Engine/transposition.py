@@ -0,0 +1,142 @@
+"""
+This implements the transposition table used by the search. It is keyed
+by the polyglot Zobrist hash (`chess.polyglot.zobrist_hash`).
+
+The table is a fixed size array of 64 bit words so it never grows. It can
+use any writable buffer (like a `bytearray` or the `buf` of a
+`multiprocessing.shared_memory.SharedMemory`) so more than one process
+can share the same table.
+
+Each entry is 2 words:
+    word 0: key XOR data (so a half written entry is seen as a miss)
+    word 1: data
+The data word is packed like this:
+ ------------- ------------- ------------- --------- ------------
+|   0 .. 15   |   16 .. 47  |   48 .. 55  | 56, 57  |  58 .. 63  |
+ ------------- ------------- ------------- --------- ------------
+| best move   | score       | depth       | bound   | generation |
+ ------------- ------------- ------------- --------- ------------
+The entries are in buckets of 2. The first slot is depth-preferred and the
+second slot is always replaced.
+"""
+
+
+import chess
+
+
+EXACT = 0
+LOWER = 1 # The score is at least this (failed high)
+UPPER = 2 # The score is at most this (failed low)
+
+ENTRY_SIZE = 16 # In bytes
+BUCKET_SIZE = 2 # In entries
+SCORE_OFFSET = 1 << 31
+
+
+def encode_move(move: chess.Move) -> int:
+    if move is None:
+        return 0
+    promotion = move.promotion or 0
+    return move.from_square | (move.to_square << 6) | (promotion << 12)
+
+def decode_move(number: int) -> chess.Move:
+    if number == 0:
+        return None
+    promotion = (number >> 12) & 7
+    return chess.Move(number & 63, (number >> 6) & 63, promotion or None)
+
+def size_in_bytes(size_mb: float) -> int:
+    """
+    Returns the number of bytes the table needs for `size_mb` MB. It is
+    always a whole number of buckets.
+    """
+    bucket_bytes = ENTRY_SIZE*BUCKET_SIZE
+    buckets = max(1, int(size_mb*1024*1024)//bucket_bytes)
+    return buckets*bucket_bytes
+
+
+class TranspositionTable:
+    def __init__(self, size_mb: float=16, buffer=None):
+        if buffer is None:
+            buffer = bytearray(size_in_bytes(size_mb))
+        self.buffer = buffer
+        # Make sure that we only use a whole number of buckets
+        length = len(buffer)//(ENTRY_SIZE*BUCKET_SIZE)*ENTRY_SIZE*BUCKET_SIZE
+        self.table = memoryview(buffer)[:length].cast("Q")
+        self.buckets = length//(ENTRY_SIZE*BUCKET_SIZE)
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return self.buckets*BUCKET_SIZE
+
+    def new_search(self) -> None:
+        """
+        Call before every search so that old entries can be replaced first.
+        """
+        self.generation = (self.generation+1) & 63
+
+    def clear(self) -> None:
+        for i in range(len(self.table)):
+            self.table[i] = 0
+
+    def release(self) -> None:
+        """
+        Releases the memoryview so that the buffer can be closed.
+        """
+        self.table.release()
+
+    def probe(self, key: int) -> tuple:
+        """
+        Returns `(depth, bound, score, move)` if `key` is in the table
+        else None.
+        """
+        index = (key % self.buckets)*BUCKET_SIZE*2
+        table = self.table
+        for slot in range(index, index+BUCKET_SIZE*2, 2):
+            data = table[slot+1]
+            if table[slot] ^ data == key:
+                return self.unpack(data)
+        return None
+
+    def store(self, key: int, depth: int, bound: int, score: int,
+              move: chess.Move) -> None:
+        """
+        Stores an entry for `key` using the replacement policy:
+            slot 0 is replaced if it has the same key, if the new depth
+                   is at least as deep or if it is from an old search
+            slot 1 is always replaced
+        """
+        index = (key % self.buckets)*BUCKET_SIZE*2
+        table = self.table
+        old_data = table[index+1]
+        old_key = table[index] ^ old_data
+        old_depth = (old_data >> 48) & 0xFF
+        old_generation = old_data >> 58
+        if (old_key != key) and (old_data != 0) and \
+           (old_generation == self.generation) and (depth < old_depth):
+            index += 2 # Use the always-replace slot
+
+        if move is None:
+            # Don't forget the best move if we don't have a new one
+            data = table[index+1]
+            if (table[index] ^ data) == key:
+                move_bits = data & 0xFFFF
+            else:
+                move_bits = 0
+        else:
+            move_bits = encode_move(move)
+        data = self.pack(depth, bound, score, move_bits)
+        table[index+1] = data
+        table[index] = key ^ data
+
+    def pack(self, depth: int, bound: int, score: int, move: int) -> int:
+        depth = min(max(depth, 0), 0xFF)
+        return move | ((score+SCORE_OFFSET) << 16) | (depth << 48) | \
+               (bound << 56) | (self.generation << 58)
+
+    def unpack(self, data: int) -> tuple:
+        move = decode_move(data & 0xFFFF)
+        score = ((data >> 16) & 0xFFFFFFFF)-SCORE_OFFSET
+        depth = (data >> 48) & 0xFF
+        bound = (data >> 56) & 3
+        return depth, bound, score, move
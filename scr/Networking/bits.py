@@ -1,32 +1,60 @@
 """
-This module implements the Bits class. It uses a string as its value
-(not the best method).
+This module implements the Bits class. The bits are stored in a
+bytearray (most significant bit first) and the last few bits that don't
+make a full byte yet are kept in an int. Adding bits to the end and
+reading bits are both O(1) for each byte so nothing is copied when
+building or reading a message.
+Use:
+    bits = Bits()
+    bits.append(5, 3)   # "101"
+    bits.append(1, 5)   # "10100001"
+    bits.read(3)        # 5 (reads from `bits.position`)
+    bits.get(3, 5)      # 1 (reads from anywhere)
+    bits.view()         # memoryview of the bytes (no copy)
+The old string based API (`Bits("0101")`, slicing, `concatenate`,
+`from_int`, `from_bytes`, `to_bytes`, ...) still works.
 """
 
 
-import struct
-
-
 class Bits:
+    __slots__ = ("data", "pending", "pending_length", "position")
+
     def __init__(self, value: str=None):
+        self.data = bytearray() # All of the full bytes
+        self.pending = 0 # The bits after the last full byte
+        self.pending_length = 0 # Always less than 8
+        self.position = 0 # Where `read` reads from
         if value is None:
             value = ""
         assert isinstance(value, str)
         assert value.replace("1", "").replace("0", "") == ""
-        self.value = value
+        if value != "":
+            self.append(int(value, 2), len(value))
 
     def __repr__(self) -> str:
-        if self.value == "":
+        if len(self) == 0:
             value = "None"
         else:
-            value = self.value
+            value = str(self)
         return "<Bits object at "+hex(id(self))+" value="+value+">"
 
-    def __getitem__(self, key) -> str:
-        return Bits(self.value[key])
+    def __getitem__(self, key):
+        length = len(self)
+        if isinstance(key, slice):
+            start, stop, step = key.indices(length)
+            if step != 1:
+                return Bits(str(self)[key])
+            return self.slice(start, max(stop-start, 0))
+        if key < 0:
+            key += length
+        if not (0 <= key < length):
+            raise IndexError("Bits index out of range")
+        return self.slice(key, 1)
 
     def __bool__(self) -> bool:
-        return (self.value != "0") and (self.value != "")
+        # Same as the old string version where only "" and "0" are False
+        length = len(self)
+        return (length > 1) or ((length == 1) and (self.pending == 1))
 
     def __int__(self) -> int:
         return self.to_int()
@@ -35,7 +63,14 @@ class Bits:
         return self.to_bytes()
 
     def __str__(self) -> str:
-        return self.value
+        length = len(self)
+        if length == 0:
+            return ""
+        return format(self.to_int(), "0"+str(length)+"b")
+
+    @property
+    def value(self) -> str:
+        return str(self)
 
     def __add__(self, other):
         if not isinstance(other, self.__class__):
@@ -58,43 +93,129 @@ class Bits:
         return Bits.from_int(int(self)*int(other))
 
     def __len__(self) -> int:
-        return len(self.value)
+        return len(self.data)*8+self.pending_length
+
+    def append(self, value: int, bits: int) -> None:
+        """
+        Adds `value` to the end using exactly `bits` bits.
+        """
+        if (value < 0) or (value >> bits):
+            raise ValueError("Can't fit the value in that number of bits.")
+        pending = (self.pending << bits) | value
+        pending_length = self.pending_length+bits
+        while pending_length >= 8:
+            pending_length -= 8
+            self.data.append((pending >> pending_length) & 0xff)
+        self.pending = pending & ((1 << pending_length)-1)
+        self.pending_length = pending_length
+
+    def extend(self, other) -> None:
+        """
+        Adds all of the bits from `other` to the end.
+        """
+        if self.pending_length == 0:
+            self.data += other.data
+        else:
+            for byte in other.data:
+                self.append(byte, 8)
+        self.append(other.pending, other.pending_length)
+
+    def get(self, start: int, bits: int) -> int:
+        """
+        Returns `bits` bits starting from `start` as an int.
+        """
+        end = start+bits
+        if (start < 0) or (end > len(self)):
+            raise IndexError("Not enough bits.")
+        if bits == 0:
+            return 0
+        full_length = len(self.data)*8
+        first_byte = start//8
+        if end <= full_length:
+            last_byte = -(-end//8)
+            value = int.from_bytes(self.data[first_byte:last_byte], "big")
+            return (value >> (last_byte*8-end)) & ((1 << bits)-1)
+        # Some of the bits are in `self.pending`
+        value = int.from_bytes(self.data[first_byte:], "big")
+        value = (value << self.pending_length) | self.pending
+        return (value >> (len(self)-end)) & ((1 << bits)-1)
+
+    def read(self, bits: int) -> int:
+        """
+        Returns the next `bits` bits (as an int) from `self.position` and
+        moves `self.position` after them.
+        """
+        value = self.get(self.position, bits)
+        self.position += bits
+        return value
+
+    def seek(self, position: int) -> None:
+        self.position = position
+
+    def remaining(self) -> int:
+        """
+        The number of bits that `read` hasn't read yet.
+        """
+        return len(self)-self.position
+
+    def slice(self, start: int, bits: int):
+        """
+        Returns a new Bits object with `bits` bits starting from `start`.
+        """
+        output = Bits()
+        if start%8 == 0:
+            # The full bytes can be copied in one go
+            full = bits//8
+            output.data += self.data[start//8:start//8+full]
+            start += full*8
+            bits -= full*8
+        output.append(self.get(start, bits), bits)
+        return output
+
+    def view(self) -> memoryview:
+        """
+        Returns a memoryview of the bytes without copying them. The number
+        of bits must be a multiple of 8.
+        """
+        if self.pending_length != 0:
+            raise ValueError("bits not a multiple of 8")
+        return memoryview(self.data)
 
     def to_int(self) -> int:
-        if self.value == "":
-            return 0
-        return int(self.value, 2)
+        value = int.from_bytes(self.data, "big")
+        return (value << self.pending_length) | self.pending
 
     def to_bytes(self, errors="strict") -> bytes:
-        if (len(self)%8 != 0):
+        if self.pending_length != 0:
             if errors == "strict":
                 raise ValueError("bits not a multiple of 8")
-            else:
-                self = self.concatenate(Bits("0"*(8-len(self)%8)))
-        
-        output = bytes()
-        for i in range(int(len(self)/8)):
-            chunk = int(self[i*8:(i+1)*8])
-            output += struct.pack("!B", chunk)
-        return output
+            # Pad with 0s
+            last = self.pending << (8-self.pending_length)
+            return bytes(self.data)+bytes((last,))
+        return bytes(self.data)
 
     def concatenate(self, other):
-        return Bits(self.value+other.value)
+        output = Bits()
+        output.data += self.data
+        output.pending = self.pending
+        output.pending_length = self.pending_length
+        output.extend(other)
+        return output
 
     @classmethod
     def from_bytes(cls, _bytes: bytes):
         bits = cls()
-        for i in _bytes:
-            bits = bits.concatenate(cls.from_int(i, bits=8))
+        bits.data += _bytes
         return bits
 
     @classmethod
     def from_int(cls, value: int, bits=None):
         if not isinstance(value, int):
             raise ValueError("value must be an int.")
-        output = "{0:b}".format(value)
-        if bits is not None:
-            if bits-len(output) < 0:
-                raise ValueError("Can't fit the value in that number of bits.")
-            output = "0"*(bits-len(output))+output
-        return cls(output)
+        if value < 0:
+            raise ValueError("value can't be negative.")
+        if bits is None:
+            bits = max(value.bit_length(), 1)
+        output = cls()
+        output.append(value, bits)
+        return output
@@ -64,7 +64,7 @@ def get_check_sum(bits_to_sum: Bits, bits=None) -> Bits:
     This sums the bits (as a Bits object) and takes the modulo of the number
     of bits required. It returns a Bits object.
     """
-    sum = str(bits_to_sum).count("1")
+    sum = bin(int(bits_to_sum)).count("1")
     if bits is not None:
         sum %= bits
     return Bits.from_int(sum, bits=bits)
@@ -76,19 +76,13 @@ def compress_move(move: chess.Move) -> Bits:
     """
     if move == "undo":
         return Bits.from_int(0, bits=16)
-    position1 = Bits.from_int(move.from_square, bits=6)
-    position2 = Bits.from_int(move.to_square, bits=6)
-    position = position1.concatenate(position2)
-
     if move.promotion is None:
         promotion = 0
     else:
         promotion = move.promotion-2
-    promotion = Bits.from_int(promotion, bits=2)
-    move = position.concatenate(promotion)
-
-    check_sum = get_check_sum(move, bits=2)
-    return move.concatenate(check_sum)
+    value = (move.from_square << 8) | (move.to_square << 2) | promotion
+    check_sum = bin(value).count("1")%2
+    return Bits.from_int((value << 2) | check_sum, bits=16)
 # Done compressing move
 
 # Starting decompressing move
@@ -98,13 +92,15 @@ def decompress_move(compressed: Bits, errors="strict") -> chess.Move:
     None is the data is corrupt. It returns a null chess.Move if the compressed
     is all 0s.
     """
-    cpos1, cpos2 = compressed[:6], compressed[6:12]
-    cpro, check = compressed[12:14], compressed[14:]
-    if str(compressed[:14]).count("1")%len(check) != int(check):
+    if len(compressed) < 16:
         return None
-    pos1 = int(cpos1)
-    pos2 = int(cpos2)
-    pro = int(cpro)+2
+    value = compressed.get(0, 14)
+    check = compressed.get(14, len(compressed)-14)
+    if bin(value).count("1")%(len(compressed)-14) != check:
+        return None
+    pos1 = value >> 8
+    pos2 = (value >> 2) & 63
+    pro = (value & 3)+2
     return chess.Move(pos1, pos2, promotion=pro)
 # Done decompressing move
 
@@ -137,23 +133,15 @@ def compress_fen(fen: str) -> Bits:
     i = 0
     while i < len(fen):
         if fen[i].isdigit():
-            new = Bits.from_int(0, bits=1)
             if (i+1 != len(fen)) and fen[i+1].isdigit():
-                number = new.concatenate(Bits.from_int(int(fen[i:i+2]), bits=6))
-                new_fen = new_fen.concatenate(number)
+                new_fen.append(int(fen[i:i+2]), 7)
                 i += 1
             else:
-                number = new.concatenate(Bits.from_int(int(fen[i]), bits=6))
-                new_fen = new_fen.concatenate(number)
+                new_fen.append(int(fen[i]), 7)
         else:
-            new = Bits.from_int(1, bits=1)
-            if fen[i] == fen[i].lower():
-                new = new.concatenate(Bits.from_int(0, bits=1))
-            else:
-                new = new.concatenate(Bits.from_int(1, bits=1))
+            colour = int(fen[i] != fen[i].lower())
             value = LETTER_TO_NUMBER[fen[i].lower()]
-            new = new.concatenate(Bits.from_int(value, bits=3))
-            new_fen = new_fen.concatenate(new)
+            new_fen.append(0b10000 | (colour << 3) | value, 5)
         i += 1
     return new_fen
 # Done compressing fen
@@ -165,23 +153,26 @@ def decompress_fen(bits: Bits, errors="strict") -> str:
     inverse of `compress_fen(fen: str) -> Bits`
     """
     fen = ""
-    while len(bits) > 0:
-        if len(bits) < 5:
+    position = 0
+    length = len(bits)
+    while position < length:
+        if length-position < 5:
             if errors == "strict":
                 raise ValueError("Invalid compressed fen")
             else:
                 break
-        chunk, bits = bits[:5], bits[5:]
-        if chunk[0]:
-            piece_number = int(chunk[2:])
-            piece = NUMBER_TO_LETTER[piece_number]
-            if chunk[1]:
+        chunk = bits.get(position, 5)
+        position += 5
+        if chunk & 0b10000:
+            piece = NUMBER_TO_LETTER[chunk & 0b111]
+            if chunk & 0b1000:
                 piece = piece.upper()
             fen += piece
         else:
-            chunk_part, bits = bits[:2], bits[2:]
-            chunk = chunk.concatenate(chunk_part)
-            fen += str(int(chunk))
+            extra = min(2, length-position)
+            chunk = (chunk << extra) | bits.get(position, extra)
+            position += extra
+            fen += str(chunk)
     fen = add_slashes(fen, errors=errors)
     if fen[-1] == "/":
         fen = fen[:-1]
@@ -1,60 +1,139 @@
 # not udp as some packets will be lost
-import re
-import socket
+"""
+All of the sockets (servers waiting for a connection and connections to
+other players) are handled by one thread that uses `selectors` to wait
+until one of them has something to read. Nothing runs while the
+connections are idle.
+The received frames are put in `Connector.events` (a thread safe queue)
+and the function given to `Connector.bind` is called (with no arguments)
+to say that there is something new in the queue. It is called from the
+IO thread so it must not use tkinter.
+Use:
+    connector = Connector(ip="127.0.0.1", port=65360)
+    connector.bind(wake_up)
+    connector.send(MOVE, payload)
+    event = connector.events.get_nowait()
+    connector.kill()
+"""
+
+
+import collections
+import selectors
 import threading
+import socket
+import queue
 
 from .bits import Bits
+from .framing import FrameDecoder, encode_frame, CLOSED
+
+
+_loop = None
+_loop_lock = threading.Lock()
 
 
 class Event:
-    def __init__(self, data: Bits):
+    def __init__(self, kind: int, data: Bits):
+        self.kind = kind # One of the frame types in `framing.py`
         self.data = data
 
     def __len__(self) -> int:
         return -(-len(self.data)//8)
 
 
-class Reciever:
-    def __init__(self, sock: socket.socket, callback):
-        self.running = True
-        self.alowed_to_recv = False
-        self.callback = callback
-        self.sock = sock
-        thread = threading.Thread(target=self.start)
-        thread.daemon = True
-        thread.start()
-
-    def __del__(self) -> None:
-        self.kill()
+class IOLoop:
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        # Functions that other threads want to run on the IO thread
+        self.calls = collections.deque()
+        # Writing to `self.wake_up_sock` wakes up `selector.select`
+        self.wake_up_sock, self.wake_up_recv_sock = socket.socketpair()
+        self.wake_up_sock.setblocking(False)
+        self.wake_up_recv_sock.setblocking(False)
+        self.selector.register(self.wake_up_recv_sock, selectors.EVENT_READ,
+                               self.woken_up)
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
 
-    def start(self) -> None:
-        while self.running:
-            if self.alowed_to_recv:
+    def run(self) -> None:
+        while True:
+            for key, _ in self.selector.select():
                 try:
-                    data = self.sock.recv(1024)
-                    if data == "":
-                        self.running = False
-                        return None
-                    self.generate_event(Bits.from_bytes(data))
-                except OSError as error:
-                    self.running = False
+                    key.data(key.fileobj)
+                except Exception:
+                    # Don't let one connection kill all of the others
+                    self.unregister(key.fileobj)
+
+    def woken_up(self, sock: socket.socket) -> None:
+        try:
+            while sock.recv(1024):
+                pass
+        except BlockingIOError:
+            pass
+        while len(self.calls) > 0:
+            function, args = self.calls.popleft()
+            try:
+                function(*args)
+            except Exception:
+                # For example registering a socket that was already
+                # closed. The other calls must still run.
+                pass
+
+    def call(self, function, *args) -> None:
+        """
+        Runs `function(*args)` on the IO thread. The selector can only be
+        changed from the IO thread.
+        """
+        if threading.current_thread() is self.thread:
+            function(*args)
+            return None
+        self.calls.append((function, args))
+        try:
+            self.wake_up_sock.send(b"\x00")
+        except BlockingIOError:
+            pass # It is going to wake up anyway
 
-    def go(self) -> None:
-        self.alowed_to_recv = True
+    def register(self, sock: socket.socket, callback) -> None:
+        """
+        `callback(sock)` will be called (on the IO thread) every time
+        `sock` has data to read (or a connection to accept).
+        """
+        self.call(self.selector.register, sock, selectors.EVENT_READ,
+                  callback)
 
-    def stop(self) -> None:
-        self.alowed_to_recv = False
+    def unregister(self, sock: socket.socket) -> None:
+        self.call(self._unregister, sock)
 
-    def kill(self) -> None:
-        self.running = False
-        self.alowed_to_recv = False
+    def _unregister(self, sock: socket.socket) -> None:
+        try:
+            self.selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+
+    def close(self, sock: socket.socket) -> None:
+        """
+        Stops watching the socket and closes it.
+        """
+        self.call(self._close, sock)
+
+    def _close(self, sock: socket.socket) -> None:
+        self._unregister(sock)
+        try:
+            sock.shutdown(socket.SHUT_RDWR) # Fully close the socket
+        except OSError:
+            pass
+        sock.close()
 
-    def destroy(self) -> None:
-        self.kill()
 
-    def generate_event(self, data: Bits) -> None:
-        event = Event(data)
-        self.callback(event)
+def get_loop() -> IOLoop:
+    """
+    Returns the IO thread that is shared by all of the connectors.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = IOLoop()
+        return _loop
 
 
 class Connector:
@@ -64,6 +143,9 @@ class Connector:
         self.thier_sock_running = False
         self.ip = ip
         self.port = port
+        self.loop = get_loop()
+        self.events = queue.SimpleQueue()
+        self.decoder = FrameDecoder()
         self.our_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         # To stop this error: OSError: [Errno 98] Address already in use
         self.our_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -74,18 +156,15 @@ class Connector:
             self.our_sock.bind(("", port))
             self.our_sock.listen(1)
             self.our_sock_running = True
-            thread = threading.Thread(target=self.wait_for_connection)
-            thread.daemon = True
-            thread.start()
+            self.loop.register(self.our_sock, self.accept)
         elif (ip is None) or (port is None):
             raise ValueError("If not server, you need to specify port and ip.")
         else:
             self.our_sock.connect((ip, port))
             self.their_sock = self.our_sock
             self.thier_sock_running = True
-            self.recver = Reciever(self.their_sock, self.recieve)
-            self.recver.go()
             self.connected = True
+            self.loop.register(self.their_sock, self.readable)
 
     def __del__(self) -> None:
         if self.connected or self.our_sock_running or self.thier_sock_running:
@@ -98,55 +177,76 @@ class Connector:
         self.receive_callback = None
 
     def recieve(self, event: Event) -> None:
+        self.events.put(event)
         if self.receive_callback is not None:
-            self.receive_callback(event)
+            self.receive_callback()
 
     def send_data(self, data: bytes) -> None:
         if not self.connected:
             return None
-        self.their_sock.send(data)
+        self.their_sock.sendall(data)
+
+    def send(self, kind: int, payload: bytes=b"") -> None:
+        """
+        Sends a frame (see `framing.py`) of type `kind`.
+        """
+        self.send_data(encode_frame(kind, payload))
 
-    def wait_for_connection(self) -> None:
+    def accept(self, sock: socket.socket) -> None:
+        """
+        Called on the IO thread when someone connects to the server.
+        """
         try:
-            self.their_sock, self.their_address = self.our_sock.accept()
-            self.thier_sock_running = True
-            self.recver = Reciever(self.their_sock, self.recieve)
-            self.recver.go()
-            self.connected = True
-        except OSError as error:
-            pass # Dirty solution.
-            # If the user open multiplayer and swtiches to PvP (for example)
-            # the socket will close. Therefore `self.our_sock.accept()` will
-            # raise an OSError
+            self.their_sock, self.their_address = sock.accept()
+        except OSError:
+            return None
+        # We only play against 1 other player
+        self.loop.unregister(sock)
+        self.thier_sock_running = True
+        self.connected = True
+        self.loop.register(self.their_sock, self.readable)
+
+    def readable(self, sock: socket.socket) -> None:
+        """
+        Called on the IO thread when the other player sent us something.
+        """
+        try:
+            data = sock.recv(4096)
+        except BlockingIOError:
+            return None
+        except OSError:
+            # For example the connection was reset
+            self.loop.unregister(sock)
+            self.recieve(Event(CLOSED, Bits()))
+            return None
+        if data == b"":
+            # The other side closed the connection
+            self.loop.unregister(sock)
+            self.recieve(Event(CLOSED, Bits()))
+            return None
+        try:
+            # One recv can have many frames or only part of one
+            frames = self.decoder.feed(data)
+        except ValueError:
+            # The data is garbage so we can't trust the connection
+            self.loop.unregister(sock)
+            self.recieve(Event(CLOSED, Bits()))
+            return None
+        for kind, payload in frames:
+            self.recieve(Event(kind, Bits.from_bytes(payload)))
 
     def kill(self) -> None:
-        if self.connected: # Kill the recver
-            self.recver.stop()
-            self.recver.kill()
-            self.recver.destroy()
-            self.connected = False
+        self.unbind()
+        self.connected = False
 
         if self.our_sock_running:
-            try:
-                self.our_sock.shutdown(socket.SHUT_RDWR) #Fully close the socket
-                self.our_sock.close()
-            except:
-                pass
-            del self.our_sock
+            self.loop.close(self.our_sock)
             self.our_sock_running = False
 
         if self.thier_sock_running:
-            try:
-                self.their_sock.shutdown(socket.SHUT_RDWR) #Fully close the socket
-            except:
-                pass
-            self.their_sock.close()
-            del self.their_sock
+            self.loop.close(self.their_sock)
             self.thier_sock_running = False
 
-        self.alowed_to_recv = False
-        self.unbind()
-
 
 def get_ip() -> str:
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
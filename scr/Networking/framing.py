@@ -0,0 +1,106 @@
+"""
+This is the wire protocol used by `Networking/connector.py`. TCP is a
+stream so 2 messages can arrive in one `recv` and one message can be
+split between 2 `recv`s. Each message is sent as a frame:
+ ----------- ------------------ ----------------
+| 1 byte    | 1 to 4 bytes     | length bytes   |
+ ----------- ------------------ ----------------
+| type      | length (varint)  | payload        |
+ ----------- ------------------ ----------------
+The length is a varint: 7 bits per byte (least significant first) and
+the top bit is set if more bytes follow.
+Use:
+    data = encode_frame(MOVE, compress_move(move).to_bytes())
+    decoder = FrameDecoder()
+    for kind, payload in decoder.feed(sock.recv(4096)):
+        ...
+"""
+
+
+# The frame types
+HEARTBEAT = 0
+MOVE = 1
+DATA = 2
+COLOUR = 3 # Sent by `Networking/server.py`. The payload is 1 for white
+# Not a frame type. Used by the connector when the connection is closed.
+CLOSED = -1
+
+MAX_FRAME_SIZE = 1 << 20 # 1 MB. Anything bigger must be garbage
+
+
+def encode_varint(value: int) -> bytes:
+    if value < 0:
+        raise ValueError("value can't be negative.")
+    output = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value == 0:
+            output.append(byte)
+            return bytes(output)
+        output.append(byte | 0x80)
+
+def encode_frame(kind: int, payload: bytes=b"") -> bytes:
+    """
+    Returns the bytes that need to be sent for the frame.
+    """
+    if not (0 <= kind <= 255):
+        raise ValueError("The frame type must fit in a byte.")
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ValueError("The payload is too big.")
+    return bytes((kind,))+encode_varint(len(payload))+bytes(payload)
+
+
+class FrameDecoder:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        """
+        Adds the received data and returns a list of `(type, payload)` for
+        all of the frames that are complete. What is left of the last
+        frame is kept until the rest of it arrives.
+        """
+        buffer = self.buffer
+        buffer += data
+        frames = []
+        start = 0
+        while True:
+            frame = self.decode(start)
+            if frame is None:
+                break
+            kind, payload, start = frame
+            frames.append((kind, payload))
+        if start > 0:
+            del buffer[:start]
+        return frames
+
+    def decode(self, start: int):
+        """
+        Tries to decode the frame at `start`. Returns None if the frame
+        isn't complete yet else `(type, payload, end)`.
+        """
+        buffer = self.buffer
+        i = start+1
+        length = 0
+        shift = 0
+        while True:
+            if i >= len(buffer):
+                return None
+            byte = buffer[i]
+            length |= (byte & 0x7f) << shift
+            shift += 7
+            i += 1
+            if not (byte & 0x80):
+                break
+            if shift > 28:
+                raise ValueError("Invalid frame length.")
+        if length > MAX_FRAME_SIZE:
+            raise ValueError("The frame is too big.")
+        end = i+length
+        if end > len(buffer):
+            return None
+        return buffer[start], bytes(buffer[i:end]), end
+
+    def clear(self) -> None:
+        self.buffer.clear()
@@ -0,0 +1,307 @@
+"""
+This is a headless server that can host a lot of multiplayer games at
+the same time. Every client that connects waits until another one
+connects and then the 2 of them are put in a game. The server tells each
+client its colour (a COLOUR frame) and then relays the frames between
+them (see `Networking/framing.py`).
+The server keeps its own `chess.Board` for each game so illegal moves
+(or moves played out of turn) are never relayed. The player that sends
+one is disconnected, which ends the game.
+Everything runs on one thread with `selectors` and non-blocking sockets
+so an idle game doesn't cost anything.
+Run it (from the folder with `main.py`) with:
+    python -m Networking.server --port 65360
+To play, both players connect as black ("no" when asked if they want to
+play as white) and type in the server's IP. The server then tells them
+what colour they really are.
+"""
+
+
+import argparse
+import selectors
+import socket
+import errno
+import chess
+
+try:
+    import resource # Not on Windows
+except ImportError:
+    resource = None
+
+from .bits import Bits
+from .compression import decompress_move
+from .framing import FrameDecoder, encode_frame
+from .framing import HEARTBEAT, MOVE, DATA, COLOUR
+
+
+PORT = 65360
+BACKLOG = 128
+# If a client doesn't read what we send it we stop keeping it in memory
+MAX_BUFFER_SIZE = 1 << 16
+# Each client uses a file descriptor so the default limit (often 1024)
+# only allows about 500 games. This is the most we ask for.
+MAX_FILES = 1 << 16
+# `accept` fails with these when we run out of file descriptors
+OUT_OF_FILES = (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM)
+
+
+class Client:
+    def __init__(self, sock: socket.socket, address: tuple):
+        self.sock = sock
+        self.address = address
+        self.decoder = FrameDecoder()
+        self.buffer = bytearray() # Waiting to be sent
+        self.writing = False # Waiting for the socket to be writable
+        self.game = None
+        self.colour = None
+        self.closed = False
+
+
+class Game:
+    def __init__(self, white: Client, black: Client):
+        self.board = chess.Board()
+        self.players = {chess.WHITE: white, chess.BLACK: black}
+
+    def opponent(self, client: Client) -> Client:
+        return self.players[not client.colour]
+
+
+class GameServer:
+    def __init__(self, port: int=PORT, host: str=""):
+        self.selector = selectors.DefaultSelector()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # To stop this error: OSError: [Errno 98] Address already in use
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(BACKLOG)
+        self.sock.setblocking(False)
+        self.selector.register(self.sock, selectors.EVENT_READ, None)
+        # False while we can't accept anyone (see `accept`)
+        self.listening = True
+        self.waiting = None # The client that is waiting for an opponent
+        self.games = 0
+        self.running = True
+
+    def serve_forever(self) -> None:
+        while self.running:
+            for key, mask in self.selector.select():
+                if key.data is None:
+                    self.accept()
+                    continue
+                client = key.data
+                if mask & selectors.EVENT_READ:
+                    self.readable(client)
+                if (mask & selectors.EVENT_WRITE) and (not client.closed):
+                    self.flush(client)
+
+    def accept(self) -> None:
+        try:
+            sock, address = self.sock.accept()
+        except BlockingIOError:
+            return None
+        except OSError as error:
+            if error.errno in OUT_OF_FILES:
+                # The new connection stays in the backlog so the socket
+                # stays readable. Stop watching it (or `select` would
+                # return right away forever) until a client leaves.
+                self.pause_listening()
+            return None
+        sock.setblocking(False)
+        client = Client(sock, address)
+        self.selector.register(sock, selectors.EVENT_READ, client)
+        if (self.waiting is None) or self.waiting.closed:
+            self.waiting = client
+        else:
+            self.start_game(self.waiting, client)
+            self.waiting = None
+
+    def pause_listening(self) -> None:
+        if self.listening:
+            self.listening = False
+            self.selector.unregister(self.sock)
+
+    def resume_listening(self) -> None:
+        if (not self.listening) and self.running:
+            self.listening = True
+            self.selector.register(self.sock, selectors.EVENT_READ, None)
+
+    def start_game(self, white: Client, black: Client) -> None:
+        game = Game(white, black)
+        for colour, client in game.players.items():
+            client.game = game
+            client.colour = colour
+            self.send(client, COLOUR, bytes((int(colour),)))
+        self.games += 1
+
+    def readable(self, client: Client) -> None:
+        try:
+            data = client.sock.recv(4096)
+        except BlockingIOError:
+            return None
+        except OSError:
+            data = b""
+        if data == b"":
+            # The client left
+            self.drop(client)
+            return None
+        try:
+            frames = client.decoder.feed(data)
+        except ValueError:
+            self.drop(client) # Garbage
+            return None
+        for kind, payload in frames:
+            if client.closed:
+                break
+            self.handle_frame(client, kind, payload)
+
+    def handle_frame(self, client: Client, kind: int, payload: bytes) -> None:
+        game = client.game
+        if game is None:
+            return None # Still waiting for an opponent
+        opponent = game.opponent(client)
+        if kind == MOVE:
+            move = decompress_move(Bits.from_bytes(payload))
+            if move is None:
+                return None # Corrupt so ignore it like the clients do
+            if move.from_square == move.to_square:
+                self.special_move(game, move)
+            elif not self.play_move(game, client, move):
+                self.drop(client)
+                return None
+        elif kind not in (HEARTBEAT, DATA):
+            return None # The clients don't know what to do with it
+        self.send(opponent, kind, payload)
+
+    def play_move(self, game: Game, client: Client, move: chess.Move) -> bool:
+        """
+        Plays the move on the server's board if it is legal. Returns False
+        if it isn't.
+        """
+        if game.board.turn != client.colour:
+            return False
+        # The compressed move always has a promotion so remove it if the
+        # move isn't a promotion (same as `Multiplayer.recieved_move`)
+        if move not in game.board.legal_moves:
+            move.promotion = None
+        if move not in game.board.legal_moves:
+            return False
+        game.board.push(move)
+        return True
+
+    def special_move(self, game: Game, move: chess.Move) -> None:
+        """
+        Keeps the server's board the same as the clients' for the special
+        moves in `Networking/compression.py`.
+        """
+        if move.from_square == 2:
+            # The undo was allowed so both clients undo the last move
+            if len(game.board.move_stack) > 0:
+                game.board.pop()
+
+    def send(self, client: Client, kind: int, payload: bytes=b"") -> None:
+        if client.closed:
+            return None
+        client.buffer += encode_frame(kind, payload)
+        if len(client.buffer) > MAX_BUFFER_SIZE:
+            self.drop(client)
+            return None
+        self.flush(client)
+
+    def flush(self, client: Client) -> None:
+        """
+        Sends as much of the client's buffer as the socket can take right
+        now and waits for the socket to be writable for the rest.
+        """
+        try:
+            sent = client.sock.send(client.buffer)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self.drop(client)
+            return None
+        del client.buffer[:sent]
+        writing = len(client.buffer) > 0
+        if writing != client.writing:
+            client.writing = writing
+            events = selectors.EVENT_READ
+            if writing:
+                events |= selectors.EVENT_WRITE
+            self.selector.modify(client.sock, events, client)
+
+    def drop(self, client: Client) -> None:
+        """
+        Disconnects the client. Its opponent is disconnected as well so it
+        knows that the game is over.
+        """
+        if client.closed:
+            return None
+        client.closed = True
+        if self.waiting is client:
+            self.waiting = None
+        self.selector.unregister(client.sock)
+        try:
+            client.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        client.sock.close()
+        # There is a free file descriptor now
+        self.resume_listening()
+        game = client.game
+        if game is not None:
+            opponent = game.opponent(client)
+            client.game = None
+            opponent.game = None
+            self.games -= 1
+            self.drop(opponent)
+
+    def close(self) -> None:
+        self.running = False
+        for key in list(self.selector.get_map().values()):
+            if key.data is not None:
+                self.drop(key.data)
+        self.pause_listening()
+        self.sock.close()
+        self.selector.close()
+
+
+def raise_file_limit(limit: int=MAX_FILES) -> int:
+    """
+    Raises the soft limit of open files (up to the hard limit) so the
+    server can host more games. Returns the new limit (or None if the OS
+    doesn't have one).
+    """
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = limit if hard == resource.RLIM_INFINITY else min(limit, hard)
+    if (soft != resource.RLIM_INFINITY) and (soft < wanted):
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+            soft = wanted
+        except (ValueError, OSError):
+            pass # Keep the old limit
+    return soft
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Hosts multiplayer games.")
+    parser.add_argument("--host", default="",
+                        help="the address to listen on (default: all)")
+    parser.add_argument("--port", type=int, default=PORT,
+                        help="the port to listen on (default: %(default)s)")
+    args = parser.parse_args()
+    limit = raise_file_limit()
+    server = GameServer(args.port, args.host)
+    print("Listening on port", args.port)
+    if limit is not None:
+        print("Can have up to", limit, "open connections")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,84 +1,178 @@
-from copy import deepcopy
-from time import sleep
-import subprocess
+import threading
 import os
 
-import chess.polyglot
-import chess.syzygy
 import chess
 
 
 import Constants.settings as settings
-import widgets
+from Engine.transposition import TranspositionTable
+from Engine.timemanager import TimeManager
+from Engine.parallel import ParallelSearch
+from Engine.evaluation import Evaluation
+from Engine.search import Search
+from Engine.tables import get_tables
 from .player import Player
+import widgets
+
 
+s = settings.Settings()
+AI_FOLDER = s.evaluation.ai
+TABLE_SIZE = s.ai.transposition_table_mb
+WORKERS = s.ai.workers
+CLOCK = s.ai.clock
+INCREMENT = s.ai.increment
+if WORKERS is None:
+    WORKERS = os.cpu_count() or 1
+# The piece tables are in the same folder as the old ccarotmodule
+DATA_FOLDER = os.path.join(os.path.dirname(AI_FOLDER), "Data")
+del s, AI_FOLDER # clean up
 
-AI_FOLDER = settings.Settings().evaluation.ai
-os_bits = str(settings.get_os_bits()) # Get the bit version of the OS
-os_extension = settings.get_os_extension()
-RUN_COMMAND = os.getcwd()+"/"+AI_FOLDER+os_bits+"bit"+os_extension
-del AI_FOLDER, os_bits, os_extension # clean up
+POLL_TIME = 20 # How often (in ms) we check if the search is done
 
 
 class AI(Player):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # The opening book and tablebase are opened once for the program
+        self.tables = get_tables()
+        # The table is kept between moves so later searches reuse the work
+        if WORKERS > 1:
+            self.search = ParallelSearch(WORKERS, TABLE_SIZE, DATA_FOLDER)
+        else:
+            table = TranspositionTable(TABLE_SIZE)
+            self.search = Search(Evaluation(DATA_FOLDER), table, self.tables)
+            self.search.stop_event = threading.Event()
+        self.time_manager = TimeManager(CLOCK, INCREMENT)
+        # Changes every time we start thinking so that old results
+        # can be ignored
+        self.search_id = 0
+        self.result = None
+        self.lock = threading.Lock()
+        # Only 1 thread can use `self.search` at a time
+        self.search_lock = threading.Lock()
+        self.closed = False
 
     def go(self) -> None:
         if self.board.turn != self.colour:
             return None
+        if self.board.is_game_over():
+            return None
         if self.alowed_to_play:
-            # Doesn't work on Linux for some reason :(
-            if RUN_COMMAND[-4:] != ".exe":
-                root = self.master.winfo_toplevel()
-                x, y = root.winfo_x(), root.winfo_y()
-                widgets.info("The AI doesn't work on Linux. Sorry :(", x, y)
-                super().stop()
-                return None
-
             move = self.check_tables(self.board)
             if move is not None:
                 self.callback(move)
                 return None
 
-            number_of_pieces = self.number_of_pieces(self.board.board_fen())
+            # Searching takes seconds so it is done in another thread so
+            # that tkinter doesn't freeze (same as `Players/computer.py`)
+            with self.lock:
+                self.search_id += 1
+                self.result = None
+            board = self.board.copy()
+            thread = threading.Thread(target=self.think,
+                                      args=(board, self.search_id))
+            thread.daemon = True
+            thread.start()
+            self.master.after(POLL_TIME, self.check_result, board.fen(),
+                              self.search_id)
+
+    def think(self, board: chess.Board, search_id: int) -> None:
+        """
+        Runs in a separate thread. It searches the board and puts the move
+        (or the error) in `self.result`.
+        """
+        with self.search_lock:
+            try:
+                move = self._think(board, search_id)
+            except Exception as error:
+                move = error
+            if self.closed:
+                self.search.close()
+        with self.lock:
+            if search_id == self.search_id:
+                self.result = move
+
+    def _think(self, board: chess.Board, search_id: int) -> chess.Move:
+        with self.lock:
+            if search_id != self.search_id:
+                return None # Cancelled before we even started
+            if isinstance(self.search, Search):
+                self.search.stop_event.clear()
+            timer = self.time_manager.start_move()
+        move, _ = self.search.search(board, timer=timer)
+        with self.lock:
+            if search_id != self.search_id:
+                return None # Cancelled so don't use up the clock
+            self.time_manager.end_move(timer)
+        if move is None:
+            # checc.Board.legal_moves doesn't support indexing
+            # But I am still going to take the first item
+            for move in board.legal_moves:
+                break
+        return move
 
-            if number_of_pieces < 10:
-                depth = 5
-            elif number_of_pieces < 21:
-                depth = 4
-            else:
-                depth = 3
-
-            folder = os.getcwd()+"/ccarotmodule/"
-            hashed_move = self._go(folder, self.board, str(depth))
-            if hashed_move == 0:
-                # checc.Board.legal_moves doesn't support indexing
-                # But I am still going to take the first item
-                for move in self.board.legal_moves:
-                    self.callback(move)
-                    break
+    def check_result(self, fen: str, search_id: int) -> None:
+        """
+        Runs in the main thread. It waits for `think` to finish and gives
+        the move to GUIBoard.
+        """
+        with self.lock:
+            if search_id != self.search_id:
+                return None # This search was cancelled
+            move = self.result
+        if move is None:
+            self.master.after(POLL_TIME, self.check_result, fen, search_id)
+        elif isinstance(move, Exception):
+            self.stop()
+            root = self.master.winfo_toplevel()
+            x, y = root.winfo_x(), root.winfo_y()
+            widgets.info("The AI stopped because of an error:\n"+repr(move),
+                         x, y)
+        elif self.alowed_to_play and (self.board.fen() == fen):
+            self.callback(move)
+
+    def cancel(self) -> None:
+        """
+        Stops the search if it is running and ignores its result.
+        """
+        with self.lock:
+            self.search_id += 1
+            if isinstance(self.search, Search):
+                self.search.stop_event.set()
             else:
-                move = self.decode_move(str(hashed_move))
-                self.callback(move)
+                self.search.stop()
+
+    def stop(self) -> None:
+        self.cancel()
+        super().stop()
+
+    def destroy(self) -> None:
+        self.stop()
+        self.closed = True
+        # If a search is still running it closes `self.search` when it
+        # is done
+        if self.search_lock.acquire(blocking=False):
+            try:
+                self.search.close()
+            finally:
+                self.search_lock.release()
+        super().destroy()
+
+    def undo_move(self, move: chess.Move) -> str:
+        self.cancel()
+        if self.board.turn != self.colour:
+            # It was our move so give back the time that it took
+            with self.lock:
+                self.time_manager.undo_move()
 
-    def decode_move(self, hashed_move):
-        while len(hashed_move) < 5:
-            hashed_move = "0"+hashed_move
-        _from = int(hashed_move[:2])
-        to = int(hashed_move[2:4])
-        promotion = int(hashed_move[4])+1
-        move = chess.Move(_from, to, promotion)
-        if move not in self.board.legal_moves:
-            move = chess.Move(_from, to)
-        return move
-    
-    def number_of_pieces(self, fen):
-        fen = fen.lower()
-        number = 0
-        for piece_type in ("p", "k", "b", "r", "q"):
-            number += fen.count(piece_type)
-        return number+2 # Add 2 for the 2 kings
+    def redo_move(self, move: chess.Move) -> str:
+        self.cancel()
+
+    def new_game(self, game: object) -> None:
+        super().new_game(game)
+        self.cancel()
+        with self.lock:
+            self.time_manager.reset()
 
     def check_tables(self, board):
         move = self.polyglot_move(board)
@@ -88,42 +182,17 @@ class AI(Player):
             return move
 
     def polyglot_move(self, board):
-        polyglot_folder = "Tables/polyglot.bin"
-        with chess.polyglot.open_reader(polyglot_folder) as polyglot:
-            move = polyglot.get(board)
-            if move is not None:
-                move = move.move
-        return move
+        return self.tables.book_move(board)
 
     def syzygy_move(self, board):
-        value = self.syzygy(board)
-        if value is None:
+        # All of the legal moves with the best one first
+        moves = self.tables.probe_root(board)
+        if len(moves) == 0:
             return None
-        sign = int(value/abs(value))
-        for move in board.legal_moves:
-            child = deepcopy(board)
-            child.push(move)
-            new_value = self.syzygy(child)
-            if new_value == 0:
-                continue
-            if -sign == int(new_value/abs(new_value)):
-                if abs(new_value) == abs(value)-1:
-                    return move
+        return moves[0][0]
 
     def syzygy(self, board):
-        syzygy_folder = "Tables/syzygy/"
-        with chess.syzygy.open_tablebase(syzygy_folder) as syzygy:
-            move = syzygy.get_dtz(board)
-        return move
-
-    def _go(self, folder, board, depth) -> int:
-        command = [RUN_COMMAND, folder, board.fen(), depth]
-        print(command)
-        process = subprocess.Popen(command, shell=True)
-        while process.poll() is None:
-            sleep(0.5)
-        _eval = process.returncode
-        return _eval
+        return self.tables.probe_dtz(board)
 
     # def open_game(self, pgn: str) -> str:
     #     return "break"
@@ -1,48 +1,147 @@
 """
 This implements the Computer class. It uses Stockfish to calculate a move
-from a board position when go is called.
+from a board position when go is called. The Stockfish process comes from
+the engine pool (`Constants/engine_pool.py`) so it is only started once.
+
+Stockfish thinks in a separate thread so that tkinter doesn't freeze. The
+move is given back to the main thread using `widget.after` because
+tkinter must only be used from the main thread.
 """
 
 
-from chess.engine import SimpleEngine, Limit, Mate
+from chess.engine import Limit, Mate
+import threading
 
+from Constants.engine_pool import get_pool, ENGINE_ERRORS, PoolTimeoutError
 from .player import Player
+import widgets
 
 
-"""
-Get the correct Stockfish file that the OS can use. Fix for Issue #20.
-    stockfish_11_x64      # For Linux 64 bit
-    stockfish_11_x32.exe  # For Windows 32 bit
-    stockfish_11_x64.exe  # For Windows 64 bit
-"""
 import Constants.settings as settings
-# Get the folder of all of the Sockfishes
 s = settings.Settings()
 DEPTH = s["computer"].depth
 TIME = s["computer"].time
-STOCKFISH_FOLDER = s.evaluation.stockfish
-os_bits = str(settings.get_os_bits()) # Get the bit version of the OS
-# Get the file extension that the OS supports
-os_extension = settings.get_os_extension()
-# Combine everything to get the location
-STOCKFISH_LOCATION = STOCKFISH_FOLDER+os_bits+os_extension
-del s, settings, os_bits, os_extension, STOCKFISH_FOLDER # clean up
+del s, settings # clean up
+
+POLL_TIME = 20 # How often (in ms) we check if Stockfish has a move
+# How long (in seconds) we wait for a free engine from the pool. Analyse
+# keeps one of them for as long as it is running.
+CHECKOUT_TIMEOUT = 10+TIME
 
 
 class Computer(Player):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Changes every time we start thinking so that old results
+        # can be ignored
+        self.search_id = 0
+        self.analysis = None
+        self.result = None
+        self.lock = threading.Lock()
 
     def go(self) -> None:
         # We don't want any errors because the game is over or we lost
         # permissions to send moves to GUIBoard
         if (self.board.is_game_over()) or (not self.alowed_to_play):
             return None
+        if self.board.turn != self.colour:
+            return None
         # Improvement: Add a changing depth and time
         self.limit = Limit(depth=DEPTH, time=TIME)
-        with SimpleEngine.popen_uci(STOCKFISH_LOCATION) as engine:
-            result = engine.play(self.board, self.limit)
-        self.callback(result.move)
+        with self.lock:
+            self.search_id += 1
+            self.result = None
+        board = self.board.copy()
+        thread = threading.Thread(target=self.think,
+                                  args=(board, self.search_id))
+        thread.daemon = True
+        thread.start()
+        self.master.after(POLL_TIME, self.check_result, board.fen(),
+                          self.search_id)
+
+    def think(self, board, search_id: int) -> None:
+        """
+        Runs in a separate thread. It asks Stockfish for the best move and
+        puts it (or the error) in `self.result`.
+        """
+        try:
+            pool = get_pool()
+            try:
+                move = self._think(pool, board, search_id)
+            except PoolTimeoutError:
+                raise # Not a crash so don't wait again
+            except ENGINE_ERRORS:
+                # The engine crashed. The pool will give us a new one.
+                move = self._think(pool, board, search_id)
+        except Exception as error:
+            # No Stockfish, no free engine, the pool was closed or it
+            # crashed again
+            move = error
+        with self.lock:
+            if search_id == self.search_id:
+                self.result = move
+
+    def _think(self, pool, board, search_id: int):
+        with pool.engine(CHECKOUT_TIMEOUT) as engine:
+            with self.lock:
+                if search_id != self.search_id:
+                    return None # Cancelled before we even started
+                # `self.game` comes from GUIBoard (see `Player.new_game`)
+                # so Stockfish only gets `ucinewgame` when a new game
+                # starts, even if both players are computers
+                self.analysis = engine.analysis(board, self.limit,
+                                                game=self.game)
+            try:
+                return self.analysis.wait().move
+            finally:
+                with self.lock:
+                    self.analysis = None
+
+    def check_result(self, fen: str, search_id: int) -> None:
+        """
+        Runs in the main thread. It waits for `think` to finish and gives
+        the move to GUIBoard.
+        """
+        with self.lock:
+            if search_id != self.search_id:
+                return None # This search was cancelled
+            move = self.result
+        if move is None:
+            self.master.after(POLL_TIME, self.check_result, fen, search_id)
+        elif isinstance(move, Exception):
+            self.stop()
+            root = self.master.winfo_toplevel()
+            x, y = root.winfo_x(), root.winfo_y()
+            widgets.info("Stockfish stopped because of an error:\n"+
+                         repr(move), x, y)
+        elif self.alowed_to_play and (self.board.fen() == fen):
+            self.callback(move)
+
+    def cancel(self) -> None:
+        """
+        Stops Stockfish if it is thinking and ignores its result.
+        """
+        with self.lock:
+            self.search_id += 1
+            if self.analysis is not None:
+                try:
+                    self.analysis.stop()
+                except ENGINE_ERRORS:
+                    pass
+
+    def stop(self) -> None:
+        self.cancel()
+        super().stop()
+
+    def undo_move(self, move) -> str:
+        self.cancel()
+
+    def new_game(self, game: object) -> None:
+        super().new_game(game)
+        self.cancel()
+
+    def redo_move(self, move) -> str:
+        self.cancel()
 
     def set_fen(self, fen: str) -> str:
         return "break"
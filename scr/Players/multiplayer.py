@@ -1,7 +1,6 @@
+import tkinter as tk
 import time
-import copy
 import chess
-from threading import Lock
 
 from Constants.SuperClass import SuperClass
 from .user import User
@@ -9,10 +8,12 @@ from Networking.bits import Bits
 from Networking.compression import compress_move, decompress_move
 from Networking.compression import compress_fen, decompress_fen
 from Networking.connector import Connector, Event
+from Networking.framing import HEARTBEAT, MOVE, COLOUR, CLOSED
 import widgets
 
 
 PORT = 65360
+HEARTBEAT_DELAY = 500 # Time (in ms) between heartbeats
 
 class Multiplayer(User, SuperClass):
     def __init__(self, *args, **kwargs):
@@ -33,12 +34,12 @@ class Multiplayer(User, SuperClass):
             ip = window.wait()
             window.destroy()
 
+        self.events_pending = False
+        self.master.bind("<<NetworkEvent>>", self.handle_events, True)
         self.build_connection(ip, self.colour)
-        self.event_lock = Lock()
-        self.event_queue = []
         self.last_self_heartbeat = time.time()
         self.last_other_heartbeat = time.time()
-        self._update()
+        self.heartbeat()
 
     def __del__(self) -> None:
         if self.running:
@@ -51,6 +52,7 @@ class Multiplayer(User, SuperClass):
         same instance. Therefore, this will be called twice.
         """
         self.running = False
+        self.master.unbind("<<NetworkEvent>>")
         self.connector.unbind()
         self.connector.kill()
         super().stop()
@@ -82,42 +84,37 @@ class Multiplayer(User, SuperClass):
         if self.connector.connected:
             if self.debug:
                 self.logger.log("connection.send.move", str(move))
-            compressed = compress_move(move).to_bytes()
-            self.connector.send_data(compressed)
+            compressed = compress_move(move).view()
+            self.connector.send(MOVE, compressed)
 
-    def receiver(self, event: Event) -> None:
+    def receiver(self) -> None:
         """
-        This adds the event to the event queue to be handled by _update.
-        The event can't be handled here as tkinter will complain about
-        the thread not being in the main loop.
+        Called from the connector's IO thread when there are new events in
+        `self.connector.events`. We can't use tkinter from that thread so
+        we just wake up the main thread. If a wake up is already waiting
+        we don't need to send another one.
         """
-        self.event_lock.acquire()
-        self.event_queue.append(event)
-        self.event_lock.release()
-
-    def _update(self) -> None:
-        """
-        A never ending loop of dealing with the event queue.
-        Note: this loop stays in the main thread (the one tkinter needs)
-        because it uses the tkinter `widget.after` method. This heavily
-        relies on the main window (tk.Tk) being updated.
-        """
-        self.event_lock.acquire()
-        # We need to first deep copy the list so that we avoid thread unsafe
-        # variables that might cause problems later.
-        event_queue = copy.deepcopy(self.event_queue)
-        self.event_queue = []
-        self.event_lock.release()
-        if not self.running:
+        if self.events_pending:
             return None
-        self.check_alive()
-        # widget.after must be before the for loops as some events might
-        # take over the thread.
-        self.master.after(50, self._update)
-        for event in event_queue:
+        self.events_pending = True
+        try:
+            self.master.event_generate("<<NetworkEvent>>", when="tail")
+        except (RuntimeError, tk.TclError):
+            # The window is being destroyed
+            self.events_pending = False
+
+    def handle_events(self, _=None) -> None:
+        """
+        Deals with all of the events in `self.connector.events`. It is
+        called by the "<<NetworkEvent>>" event so it runs in the main
+        thread (the one tkinter needs).
+        """
+        self.events_pending = False
+        events = self.connector.events
+        while self.running and (not events.empty()):
+            event = events.get_nowait()
             bits = event.data
-            length = len(bits)//8 # in bytes
-            if length == 0:
+            if event.kind == CLOSED:
                 # Socket telling us that the connection is broken.
                 if self.debug:
                     self.logger.log("connection.broken")
@@ -125,17 +122,31 @@ class Multiplayer(User, SuperClass):
                 # Now we have to destroy this so we don't try to
                 # send any more data.
                 self.destroy()
-            elif length == 1:
+            elif event.kind == HEARTBEAT:
                 # We recved a heartbeat from the other player
                 self.recieved_heartbeat(bits)
-            elif length == 2:
+            elif event.kind == MOVE:
                 # We recved a move from the other player
                 self.recieved_move(event)
+            elif event.kind == COLOUR:
+                # A game server (`Networking/server.py`) told us our colour
+                self.recieved_colour(bits)
             else:
                 # We recved other larger data from the other player
                 # Can be used for a simple chat plugin later
                 self.revieved_large_data(bits)
 
+    def heartbeat(self) -> None:
+        """
+        A never ending loop that sends our heartbeats and checks the other
+        player's. Note: this loop stays in the main thread because it uses
+        the tkinter `widget.after` method.
+        """
+        if not self.running:
+            return None
+        self.check_alive()
+        self.master.after(HEARTBEAT_DELAY, self.heartbeat)
+
     def check_alive(self) -> None:
         """
         Checks how long ago we send a heartbeat and sends one.
@@ -160,11 +171,9 @@ class Multiplayer(User, SuperClass):
     def send_heartbeat(self) -> None:
         """
         We need to send a heartbeat to show that we are alive.
-        Improvement: change it so that we aren't just sending 0000 0000
         """
         if self.connector.connected:
-            data = Bits.from_int(0, bits=8)
-            self.connector.send_data(data.to_bytes(errors=None))
+            self.connector.send(HEARTBEAT)
             if self.debug:
                 self.logger.log("connection.send.heartbeat")
 
@@ -191,9 +200,20 @@ class Multiplayer(User, SuperClass):
         # We need to tell GUIBoard that we recved a move.
         super().push(move)
 
+    def recieved_colour(self, bits: Bits) -> None:
+        """
+        We are the same player object for both colours on GUIBoard so we
+        only need to change which one the user can move.
+        """
+        if len(bits) != 8:
+            return None
+        self.colour = bool(int(bits))
+        if self.debug:
+            self.logger.log("connection.recv.colour", self.colour)
+
     def revieved_large_data(self, bits: Bits) -> None:
         """
-        This is called when we recv data that is larger than 2 bytes.
+        This is called when we recv data that isn't a move or heartbeat.
         It can be used for a simple chat plugin later.
         """
         if self.debug:
@@ -16,7 +16,7 @@ class Player:
 | board        | chess.Board object | Never push moves, call self.callback   |
 | master       | tk.Canvas object   |                                        |
 | colour       | bool               | The colour of the player               |
-| pieces       | [piece.Piece, ...] | The pieces on GUIBoard                 |
+| pieces       | [piece.Piece, ...] | The piece on each square (or None)     |
 | debug        | bool               | Used only in testing                   |
 | request_undo | function           | used to requst an undo                 |
 | request_redo | function           | used to requst an redo                 |
@@ -35,6 +35,8 @@ class Player:
         self.debug = debug
 
         self.alowed_to_play = False
+        # Changes for each new game (see `new_game`)
+        self.game = None
 
     def start(self) -> None:
         self.alowed_to_play = True
@@ -83,3 +85,19 @@ class Player:
         disallow this action return `"break"`
         """
         return None
+
+    def position_changed(self) -> None:
+        """
+        This is called after a move was pushed or undone. When the whole
+        position changes `new_game` is called instead.
+        """
+        pass
+
+    def new_game(self, game: object) -> None:
+        """
+        This is called when the player is added and after the board was
+        reset, a game was opened or the position was changed. `game` is a
+        new object for each game (both players get the same one). Anything
+        that is kept for the game (like a clock) should be reset.
+        """
+        self.game = game
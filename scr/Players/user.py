@@ -25,6 +25,9 @@ from Constants.settings import Settings
 SETTINGS = Settings()
 BOARD_SETTINGS = SETTINGS.gameboard
 USER_SETTINGS = SETTINGS["user"]
+# Time (in ms) between moving the dragged piece. The motion events in
+# between are merged so the piece is moved at most ~60 times a second.
+DRAG_DELAY = 16
 
 
 class User(Player, SuperClass):
@@ -38,14 +41,46 @@ class User(Player, SuperClass):
         self.user_created_helpers = {}
         self.user_helper_making = None
         self.moved_selected_piece = False
+        self.drag_coords = None
+        self.drag_after_id = None
         self.user_created_arrow_start = None
+        # {from_square: {to_square: is_promotion}} for the current position
+        # or None if the position changed (see `position_changed`)
+        self.legal_moves_index = None
         self.bind_mouse()
         self.bind_keys()
 
     def position_to_piece(self, position: Position) -> Piece:
-        for piece in self.pieces:
-            if piece.position == position:
-                return piece
+        # `self.pieces` has the piece on each square (or None)
+        if position.i is not None:
+            return self.pieces[position.i]
+
+    def legal_targets(self, position: Position) -> dict:
+        """
+        Returns `{to_square: is_promotion}` of all of the legal moves from
+        `position`. The legal moves are only generated once per position.
+        """
+        if self.legal_moves_index is None:
+            index = {}
+            for move in self.board.generate_legal_moves():
+                targets = index.setdefault(move.from_square, {})
+                targets[move.to_square] = move.promotion is not None
+            self.legal_moves_index = index
+        return self.legal_moves_index.get(position.to_int(), {})
+
+    def position_changed(self) -> None:
+        self.legal_moves_index = None
+
+    def new_game(self, game: object) -> None:
+        super().new_game(game)
+        self.legal_moves_index = None
+
+    def is_legal(self, move: chess.Move) -> bool:
+        position = Position.from_int(move.from_square)
+        is_promotion = self.legal_targets(position).get(move.to_square)
+        if is_promotion is None:
+            return False
+        return is_promotion == (move.promotion is not None)
 
     def push(self, move: chess.Move) -> None:
         """
@@ -157,14 +192,39 @@ class User(Player, SuperClass):
                 self.select(position)
         elif name == "ButtonRelease":
             self.left_mouse_down = False
+            self.cancel_drag()
             if self.piece_selected is not None:
                 self.move_selected(pos)
         elif name == "Motion":
             if (self.piece_selected is not None) and self.left_mouse_down:
-                self.piece_selected.place(pos)
                 position = Position.from_coords(pos)
                 if position != self.piece_selected.position:
                     self.moved_selected_piece = True
+                # Only remember where the mouse is. `self.drag` moves the
+                # piece there once per `DRAG_DELAY`.
+                self.drag_coords = pos
+                if self.drag_after_id is None:
+                    self.drag_after_id = self.master.after(DRAG_DELAY,
+                                                           self.drag)
+
+    def drag(self) -> None:
+        """
+        Moves the dragged piece to where the mouse was last seen.
+        """
+        self.drag_after_id = None
+        coords, self.drag_coords = self.drag_coords, None
+        if (coords is not None) and (self.piece_selected is not None) and \
+           self.left_mouse_down:
+            self.piece_selected.place(coords)
+
+    def cancel_drag(self) -> None:
+        """
+        Stops the dragged piece from being moved again.
+        """
+        if self.drag_after_id is not None:
+            self.master.after_cancel(self.drag_after_id)
+            self.drag_after_id = None
+        self.drag_coords = None
 
     def mouse_right(self, name: str, pos: tuple) -> None:
         if self.left_mouse_down:
@@ -288,7 +348,7 @@ class User(Player, SuperClass):
             if self.legal_promoting(old, new):
                 promotion = self.askuser_pawn_promotion()
             move = chess.Move(int(old), int(new), promotion=promotion)
-            if move in self.board.legal_moves:
+            if self.is_legal(move):
                 self.delete_user_created_object()
                 self.remove_available_moves()
                 self.push(move)
@@ -311,6 +371,7 @@ class User(Player, SuperClass):
         """
         Unselects the selected piece
         """
+        self.cancel_drag()
         self.piece_selected = None
         self.remove_available_moves()
 
@@ -320,15 +381,14 @@ class User(Player, SuperClass):
         there are legal moves
         """
         piece = self.piece_selected
-        for move in self.board.legal_moves:
-            if move.from_square == piece.position.to_int():
-                position = Position.from_int(move.to_square)
-                if self.position_to_piece(position) is None:
-                    self.draw_available_move(position)
+        for square in self.legal_targets(piece.position):
+            if self.pieces[square] is None:
+                self.draw_available_move(Position.from_int(square))
 
     def remove_available_moves(self) -> None:
         for dot in self.available_move_dots:
             self.master.delete(dot)
+        self.available_move_dots.clear()
 
     def draw_available_move(self, position: Position) -> None:
         radius = self.size/9
@@ -342,8 +402,7 @@ class User(Player, SuperClass):
         return self.master.create_oval(x-r, y-r, x+r, y+r, **kwargs)
 
     def legal_promoting(self, old: Position, new: Position) -> bool:
-        potential_move = chess.Move(int(old), int(new), promotion=5)	
-        return (potential_move in self.board.legal_moves)
+        return self.legal_targets(old).get(new.to_int(), False)
 
     def askuser_pawn_promotion(self) -> str:
         self.stop()
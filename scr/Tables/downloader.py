@@ -1,35 +1,202 @@
-import urllib.request
-from re import findall
-from os.path import isfile
-
-def download_webpage(webpage):
-    htmlfile = urllib.request.urlopen(webpage)
-    htmltext = htmlfile.read()
-    return htmltext
-
-def search_for_patterm(text, pattern):
-    return findall(pattern, text)
-
-
-folder = "syzygy/"
-website = r"https://tablebase.lichess.ovh/tables/standard/3-4-5/"
-pattern = r"\w+.rtbz"# rtbw
-
-data = str(download_webpage(website))
-_list = search_for_patterm(data, pattern)
-
-
-for counter, filename in enumerate(_list):
-    downloadpath = website + filename
-    print(str(int(counter/len(_list)*10000)/100)+"%")
-    if not isfile(folder+filename):
-        try:
-            data = download_webpage(downloadpath)
-            with open(folder+filename, "wb") as file:
-                file.write(data)
-        except MemoryError:
-            with open("ERRORS.txt", "a") as error:
-                error.write(str(filename)+"\n")
-                print(filename)
-
-#145
+"""
+Downloads the Syzygy endgame tablebase used by `Engine/tables.py`.
+The tables are streamed to a ".part" file (so they are never kept in
+memory) which is renamed when it is complete. If the download is stopped
+the ".part" file is kept and the next run asks the server for the rest
+of it (an HTTP Range request). A few files are downloaded at the same
+time.
+Run it (from the folder with `main.py`) with:
+    python -m Tables.downloader                 # All of the 3-5 piece tables
+    python -m Tables.downloader --max-pieces 4 --type rtbw
+    python -m Tables.downloader --checksums checksums.md5
+The checksum file (a path or a url) is in the same format as the output
+of `md5sum` or `sha256sum`: "<hash>  <filename>" on each line.
+"""
+
+
+import concurrent.futures
+import urllib.request
+import urllib.error
+import argparse
+import hashlib
+import re
+import os
+
+
+URL = "https://tablebase.lichess.ovh/tables/standard/3-4-5/"
+FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "syzygy")
+TYPES = ("rtbw", "rtbz") # WDL and DTZ tables
+JOBS = 4
+CHUNK_SIZE = 1 << 16 # 64 KB
+TIMEOUT = 30
+
+TABLE_PATTERN = re.compile(r"[KQRBNP]+v[KQRBNP]+\.rtb[wz]")
+CHECKSUM_PATTERN = re.compile(r"^([0-9a-fA-F]{32}|[0-9a-fA-F]{64})\s+\*?(\S+)$")
+
+
+class ChecksumError(Exception):
+    pass
+
+
+def open_url(url: str, headers: dict=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    return urllib.request.urlopen(request, timeout=TIMEOUT)
+
+def read_text(location: str) -> str:
+    """
+    Reads a (small) text file from a url or a path.
+    """
+    if "://" in location:
+        with open_url(location) as response:
+            return response.read().decode("utf-8", "replace")
+    with open(location, "r") as file:
+        return file.read()
+
+def list_tables(url: str) -> list:
+    """
+    Returns the names of all of the tables in the server's folder listing.
+    """
+    names = TABLE_PATTERN.findall(read_text(url))
+    return list(dict.fromkeys(names)) # Remove the duplicates (keep order)
+
+def read_checksums(location: str) -> dict:
+    """
+    Returns `{filename: hash}` from a md5sum/sha256sum style file.
+    """
+    checksums = {}
+    for line in read_text(location).splitlines():
+        match = CHECKSUM_PATTERN.match(line.strip())
+        if match is not None:
+            checksum, name = match.groups()
+            checksums[os.path.basename(name)] = checksum.lower()
+    return checksums
+
+def count_pieces(name: str) -> int:
+    """
+    The number of pieces (including kings) in a table like "KQvKR.rtbw".
+    """
+    return len(name.split(".")[0])-1
+
+def select_tables(names: list, min_pieces: int, max_pieces: int,
+                  types: tuple=TYPES) -> list:
+    output = []
+    for name in names:
+        if name.split(".")[-1] not in types:
+            continue
+        if min_pieces <= count_pieces(name) <= max_pieces:
+            output.append(name)
+    return output
+
+def file_hash(path: str, checksum: str) -> str:
+    # md5 hashes have 32 hex digits and sha256 hashes have 64
+    hasher = hashlib.md5() if len(checksum) == 32 else hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def download(url: str, path: str, checksum: str=None) -> int:
+    """
+    Downloads `url` to `path` continuing from where the last download
+    stopped. Returns the number of bytes downloaded. Raises ChecksumError
+    if the file doesn't match `checksum` (the ".part" file is removed so
+    the next try starts again).
+    """
+    part_path = path+".part"
+    start = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+    headers = {}
+    if start > 0:
+        headers["Range"] = "bytes=%d-" % start
+    downloaded = 0
+    try:
+        response = open_url(url, headers)
+    except urllib.error.HTTPError as error:
+        # 416 means that there is nothing after `start` so it is complete
+        if (error.code != 416) or (start == 0):
+            raise
+        response = None
+    if response is not None:
+        with response:
+            # 200 means the server ignored the Range so start again
+            mode = "ab" if response.status == 206 else "wb"
+            with open(part_path, mode) as file:
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    file.write(chunk)
+                    downloaded += len(chunk)
+    if (checksum is not None) and (file_hash(part_path, checksum) != checksum):
+        os.remove(part_path)
+        raise ChecksumError("Wrong checksum for "+os.path.basename(path))
+    os.replace(part_path, path)
+    return downloaded
+
+def download_all(url: str, names: list, folder: str, jobs: int=JOBS,
+                 checksums: dict=None) -> list:
+    """
+    Downloads all of the tables in `names` that aren't in `folder` yet.
+    Returns a list of `(name, error)` for the ones that failed.
+    """
+    os.makedirs(folder, exist_ok=True)
+    if checksums is None:
+        checksums = {}
+    if not url.endswith("/"):
+        url += "/"
+    names = [name for name in names
+             if not os.path.isfile(os.path.join(folder, name))]
+    failed = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+        for name in names:
+            future = pool.submit(download, url+name, os.path.join(folder, name),
+                                 checksums.get(name))
+            futures[future] = name
+        done = 0
+        for future in concurrent.futures.as_completed(futures):
+            name = futures[future]
+            done += 1
+            error = future.exception()
+            if error is None:
+                status = "done"
+            else:
+                failed.append((name, error))
+                status = "failed: "+str(error)
+            print("[%d/%d] %s %s" % (done, len(names), name, status))
+    return failed
+
+
+def main(argv: list=None) -> int:
+    parser = argparse.ArgumentParser(description="Downloads the Syzygy "
+                                                 "endgame tablebase.")
+    parser.add_argument("--url", default=URL,
+                        help="the folder on the server (default: %(default)s)")
+    parser.add_argument("--folder", default=FOLDER,
+                        help="where to put the tables (default: %(default)s)")
+    parser.add_argument("--min-pieces", type=int, default=3)
+    parser.add_argument("--max-pieces", type=int, default=5)
+    parser.add_argument("--type", choices=TYPES+("both",), default="both",
+                        help="rtbw (win/draw/loss), rtbz (distance to "
+                             "zeroing) or both (default)")
+    parser.add_argument("--jobs", type=int, default=JOBS,
+                        help="files to download at the same time "
+                             "(default: %(default)s)")
+    parser.add_argument("--checksums", default=None,
+                        help="a md5sum/sha256sum file (path or url)")
+    args = parser.parse_args(argv)
+
+    types = TYPES if args.type == "both" else (args.type,)
+    names = select_tables(list_tables(args.url), args.min_pieces,
+                          args.max_pieces, types)
+    checksums = None
+    if args.checksums is not None:
+        checksums = read_checksums(args.checksums)
+    failed = download_all(args.url, names, args.folder, max(args.jobs, 1),
+                          checksums)
+    for name, error in failed:
+        print("Couldn't download", name+":", error)
+    return 1 if len(failed) > 0 else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
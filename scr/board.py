@@ -3,8 +3,6 @@ from chess import pgn
 import tkinter as tk
 import chess
 import time
-import copy
-import re
 
 from Players.ai import AI
 from Players.user import User
@@ -15,7 +13,8 @@ from Networking.connector import get_ip
 from Constants.SuperClass import SuperClass
 from Constants.settings import Settings
 from Constants.position import Position
-from Constants.piece import Piece
+from Constants.move_history import MoveHistory
+from Constants.piece import Piece, load_sprites, PIECE_TAG
 import widgets
 
 SETTINGS = Settings()
@@ -34,6 +33,8 @@ class GUIBoard(SuperClass):
         self.kwargs = kwargs
         self.undo_stack = []
         self.players = [None, None]
+        # A new object for each game. The players get it in `new_game`.
+        self.game = object()
         self.move_callback = move_callback
         self.size = BOARD_SETTINGS.size_of_squares
         self.set_up_board()
@@ -62,9 +63,14 @@ class GUIBoard(SuperClass):
         self.black_sqrs = BOARD_SETTINGS.dark_squares
         # Get a new chess Board and create a tkinter canvas
         self.board = chess.Board()
+        self.history = MoveHistory(self.board)
         self.master = tk.Canvas(self.root, width=self.size*8,
                                 height=self.size*8, **self.kwargs)
         self.master.grid(row=1, column=1, rowspan=3)
+        # Decode and resize all of the sprites once so that redrawing the
+        # board doesn't have to
+        load_sprites(self.master, size_of_squares=self.size,
+                     scale=BOARD_SETTINGS.scale_for_pieces)
         # This accualy sets up the squares
         self.create_board()
 
@@ -100,34 +106,81 @@ class GUIBoard(SuperClass):
         """
         # Reset the undo_stack
         self.undo_stack = []
-        self.board.push(move)
+        self.push_move(move)
         self.move_callback()
 
+    def push_move(self, move: chess.Move) -> None:
+        """
+        Pushes the move on the board and adds it to `self.history`. The SAN
+        has to be worked out before the move is pushed.
+        """
+        san = self.board.san(move)
+        self.board.push(move)
+        self.history.push(san)
+        self.position_changed()
+
     def set_up_pieces(self) -> None:
         """
-        Sets up the pieces by resetting `self.last_move_sqrs` and `self.pieces`
+        Sets up the pieces by resetting `self.last_move_sqrs`, `self.pieces`
+        and `self.squares`
         """
         self.last_move_sqrs = [None, None]
         self.pieces = []
+        # The piece on each square (or None). It is what is on the screen
+        # so `update` only has to change the squares that are different.
+        # It is also given to the players so it must never be replaced.
+        self.squares = [None]*64
         self.update()
 
     def update(self, redraw=True) -> None:
         """
         This redraws the pieces on the board if `redraw` is True
         Else just updates the root.
+        Only the pieces that are different from what is on the screen are
+        changed. A piece that moved keeps its sprite and is just moved to
+        its new square.
         """
-        if redraw:
-            # Remove all of the pieces' sprites
-            self.delete_sprites()
-            # For each square on the board
-            for i in range(64):
-                position = Position.from_int(i)
-                # Check what piece must be there and create it
+        if not redraw:
+            self.root.update()
+            return None
+        piece_map = self.board.piece_map()
+        # Remove the pieces that aren't on the correct square anymore
+        removed = {}
+        for i, piece in enumerate(self.squares):
+            if piece is None:
+                continue
+            new = piece_map.get(i)
+            if (new is not None) and (new.color == piece.colour) and \
+               (self.LETTER_TO_NAME[new.symbol().lower()] == piece.name):
+                if piece.placed: # The user dragged it away
+                    piece.show()
+                continue
+            self.squares[i] = None
+            removed.setdefault((piece.name, piece.colour), []).append(piece)
+        # Add the pieces that are missing
+        for i, new in piece_map.items():
+            if self.squares[i] is not None:
+                continue
+            position = Position.from_int(i)
+            name = self.LETTER_TO_NAME[new.symbol().lower()]
+            pieces = removed.get((name, new.color))
+            if pieces:
+                # Reuse a piece that was removed (it just moved)
+                piece = pieces.pop()
+                piece.position = position
+            else:
                 piece = self.position_to_piece(position)
-                if piece is not None:
-                    self.pieces.append(piece) # Add it to self.pieces
-                    piece.show() # Show it to the screen
-        self.root.update()
+                self.pieces.append(piece) # Add it to self.pieces
+            piece.show() # Show it to the screen
+            self.squares[i] = piece
+        # Delete the pieces that were captured
+        for pieces in removed.values():
+            for piece in pieces:
+                piece.destroy()
+                self.pieces.remove(piece) # Can't use `self.pieces = [...]`
+        # Keep the pieces above the squares that show the last move
+        self.master.tag_raise(PIECE_TAG)
+        self.root.update_idletasks()
 
     def delete_sprites(self) -> None:
         """
@@ -136,6 +189,7 @@ class GUIBoard(SuperClass):
         for pieces in self.pieces:
             pieces.destroy()
         self.pieces.clear() # Can't use `self.pieces = []`
+        self.squares[:] = [None]*64 # The players use `self.squares`
 
     def position_to_piece(self, position: Position) -> Piece:
         """
@@ -157,26 +211,14 @@ class GUIBoard(SuperClass):
 
     def pgn(self) -> str: # chess.Board is missing .pgn()
         """
-        Returns the PGN current board state in sans notation.
+        Returns the PGN current board state in sans notation like:
+            "1. e4 e5\n2. d4 exd4\n"
         """
-        board = copy.deepcopy(self.board)
-        for i in range(len(self.board.move_stack)):
-            board.pop()
-        pgn = board.variation_san(self.board.move_stack)
-        pgn = self.clean_pgn(pgn)
+        pgn = self.history.text()
+        if pgn != "":
+            pgn += "\n"
         return pgn
 
-    def clean_pgn(self, pgn: str) -> str:
-        """
-        This cleans the fen string from "1. e4 e5 2. d4 exd4" to
-        "1. e4 e5\n2. d4 exd4"
-        """
-        pgn = re.split("\d+\. ", pgn)[1:]
-        output = ""
-        for i, move_pair in enumerate(pgn):
-            output += str(i+1)+". "+move_pair.rstrip()+"\n"
-        return output
-
     def set_pgn(self, pgn: str) -> str:
         """
         Sets up the board accourding to the pgn if allowed by both current
@@ -188,7 +230,8 @@ class GUIBoard(SuperClass):
         self.reset()
         game = chess.pgn.read_game(StringIO(pgn))
         for move in game.mainline_moves():
-            self.board.push(move)
+            self.push_move(move)
+        self.new_game()
         self.update()
 
     def set_fen(self, fen: str) -> str:
@@ -203,7 +246,9 @@ class GUIBoard(SuperClass):
         tmp_board.set_fen(fen)
         if tmp_board.status() == chess.STATUS_VALID:
             self.board.set_fen(fen)
+            self.history.reset(self.board)
             self.remove_last_sqrs()
+            self.new_game()
             self.update()
         else:
             return "error"
@@ -216,7 +261,7 @@ class GUIBoard(SuperClass):
         This adds an user as the player.
         """
         self.kill_player(colour)
-        player = User(self.board, self.master, colour, self.pieces,
+        player = User(self.board, self.master, colour, self.squares,
                       self.update, self.done_move, self.request_undo_move,
                       self.request_redo_move)
         self.add_player(colour, player)
@@ -227,7 +272,7 @@ class GUIBoard(SuperClass):
         Stockfish.
         """
         self.kill_player(colour)
-        player = Computer(self.board, self.master, colour, self.pieces,
+        player = Computer(self.board, self.master, colour, self.squares,
                           self.update, self.done_move, self.request_undo_move,
                           self.request_redo_move)
         self.add_player(colour, player)
@@ -238,7 +283,7 @@ class GUIBoard(SuperClass):
         This adds an ai as the player.
         """
         self.kill_player(colour)
-        player = AI(self.board, self.master, colour, self.pieces,
+        player = AI(self.board, self.master, colour, self.squares,
                     self.update, self.done_move, self.request_undo_move,
                     self.request_redo_move)
         self.add_player(colour, player)
@@ -259,7 +304,7 @@ class GUIBoard(SuperClass):
             return None
         self.kill_player(colour)
         self.kill_player(not colour)
-        player = Multiplayer(self.board, self.master, colour, self.pieces,
+        player = Multiplayer(self.board, self.master, colour, self.squares,
                              self.update, self.done_move,
                              self.request_undo_move, self.request_redo_move,
                              debug=False)
@@ -281,6 +326,7 @@ class GUIBoard(SuperClass):
         This adds the player to `self.players`.
         """
         player.start() # We need to start the player.
+        player.new_game(self.game)
         self.players[not colour] = player
 
     def reset(self) -> None:
@@ -289,9 +335,29 @@ class GUIBoard(SuperClass):
         """
         self.remove_last_sqrs()
         self.board.reset()
+        self.history.reset(self.board)
+        self.new_game()
         self.update()
         self.players[0].go()
 
+    def new_game(self) -> None:
+        """
+        Tells the players that a new game started (see `Player.new_game`).
+        """
+        self.game = object()
+        for player in self.players:
+            if player is not None:
+                player.new_game(self.game)
+
+    def position_changed(self) -> None:
+        """
+        Tells the players that a move was pushed or undone (see
+        `Player.position_changed`).
+        """
+        for player in self.players:
+            if player is not None:
+                player.position_changed()
+
     def moves_to_san(self, moves: list) -> list:
         """
         It changes a list of `chess.Move`s to a list of str containg
@@ -355,6 +421,8 @@ class GUIBoard(SuperClass):
                 # If "break" of the current players rejected the undo
                 return "break"
         self.board.pop()
+        self.history.pop()
+        self.position_changed()
         self.undo_stack.append(move)
         self.update_last_moved()
         self.update()
@@ -374,7 +442,7 @@ class GUIBoard(SuperClass):
                 # If "break" of the current players rejected the redo
                 return "break"
         self.undo_stack.pop()
-        self.board.push(move)
+        self.push_move(move)
         self.update_last_moved()
         self.update()
         self.move_callback()
@@ -18,7 +18,9 @@ except ImportError as error:
 from functools import partial
 import tkinter as tk
 import threading
+import queue
 import sys
+import os
 
 from Constants.settings import Settings
 import Networking.updater as updater
@@ -26,9 +28,13 @@ import Networking.updater as updater
 FILETYPES = (("Chess games", "*.pgn"), ("All files", "*.*"))
 SETTINGS = Settings()
 REPORT_ERRORS = SETTINGS.startup.report_errors
+# The search processes (`Engine/parallel.py`) re-import this file as
+# "__mp_main__" so we must only start the app if we are the real program.
+# `reset_app.py` starts the program using `import main`.
+IS_PROGRAM = __name__ in ("__main__", "main")
 
 
-if SETTINGS.startup.update:
+if IS_PROGRAM and SETTINGS.startup.update:
     print("Checking for updates.")
     updates_needed = len(updater.check_for_update()) > 0
     if updates_needed:
@@ -40,6 +46,10 @@ if SETTINGS.startup.update:
 
 
 from Constants.SuperClass import SuperClass
+from Constants.pgn_database import PGNDatabase
+from Constants.explorer import Explorer
+from Constants.engine_pool import close_pool
+from Engine.tables import close_tables
 from Constants.analyse import Analyse
 from board import GUIBoard
 import Networking.reporter as reporter
@@ -51,6 +61,20 @@ class App(SuperClass):
         self.file_open = None
         self.analysing = False
         self.analyses = None
+        self.analysis_update_pending = False
+        # The move history chunks that are shown (see `update_pgn`)
+        self.history_shown = []
+        self.history_generation = None
+        # The opening explorer for the open PGN database (see `open_explorer`)
+        self.explorer = None
+        # The 2 lines in the suggested moves (see `show_suggested_moves`)
+        self.engine_moves_text = "No moves to suggest"
+        self.explorer_moves_text = ""
+        self.explorer_filename = None
+        self.loaded_explorers = queue.SimpleQueue()
+        # The PGN file that is being opened (see `open_from_file`)
+        self.opening_filename = None
+        self.loaded_databases = queue.SimpleQueue()
         self.allowed_analyses = True
         self.done_set_up = False
         self.set_up_tk()
@@ -62,6 +86,9 @@ class App(SuperClass):
         self.board.kill_player(self.board.players[0])
         self.board.kill_player(self.board.players[1])
         self.stop_analysing()
+        self.open_explorer(None)
+        close_pool()
+        close_tables()
         self.root.quit()
         self.root.destroy()
         del self.board
@@ -90,6 +117,9 @@ class App(SuperClass):
         self.root.bind("<Control-s>", self.save)
         self.root.bind("<Control-o>", self.open)
         self.root.bind("<Control-Shift-S>", self.save_as)
+        self.root.bind("<<AnalysisUpdate>>", self.update)
+        self.root.bind("<<ExplorerReady>>", self.explorer_ready)
+        self.root.bind("<<DatabaseLoaded>>", self.database_loaded)
 
     def set_up_menu(self) -> None:
         tearoff = SETTINGS.menu.tearoff
@@ -155,7 +185,7 @@ class App(SuperClass):
                                             font=font, bg=bg,
                                             **self.widget_kwargs)
         self.suggestedmoves_text.grid(row=1, column=1, sticky="news")
-        self.suggestedmoves_text.config(text="No moves to suggest")
+        self.show_suggested_moves()
 
     def set_up_movehistory(self) -> None:
         settings = SETTINGS.move_history
@@ -182,6 +212,12 @@ class App(SuperClass):
                                         state="disabled",
                                         **self.widget_kwargs)
 
+        # Shows the games in the open PGN database that reached the
+        # position. It is only packed when there is a database.
+        self.explorer_label = tk.Label(self.movehistory_frame, fg=fg, bg=bg,
+                                       font=font, anchor="w",
+                                       **self.widget_kwargs)
+
         self.movehistory_text.pack(side="left", expand=True, fill="y")
 
         sbar = widgets.AutoScrollbar(self.movehistory_frame,
@@ -224,13 +260,197 @@ class App(SuperClass):
     def open_from_file(self) -> None:
         filename = widgets.askopen(filetypes=FILETYPES)
         if (filename != ()) and (filename != ""):
-            with open(filename, "r") as file:
-                data = file.read()
-            if self.board.set_pgn(data) == "break":
-                return "break" # If the players rejected the open
+            # The file might have millions of games. Scanning it the first
+            # time takes a while so it is done in another thread and
+            # `database_loaded` is called when it is done.
+            self.opening_filename = filename
+            self.root.title("Chess.py - Opening "+os.path.basename(filename))
+            thread = threading.Thread(target=self.load_database,
+                                      args=(filename,))
+            thread.daemon = True
+            thread.start()
+
+    def load_database(self, filename: str) -> None:
+        """
+        Called in another thread by `open_from_file`.
+        """
+        try:
+            database = PGNDatabase(filename)
+        except (OSError, ValueError) as error:
+            database = error
+        self.loaded_databases.put((filename, database))
+        try:
+            self.root.event_generate("<<DatabaseLoaded>>", when="tail")
+        except (RuntimeError, tk.TclError):
+            pass # The window is being destroyed
+
+    def database_loaded(self, _=None) -> None:
+        """
+        Called by the "<<DatabaseLoaded>>" event. It asks the user which
+        game to open and opens it.
+        """
+        while not self.loaded_databases.empty():
+            filename, database = self.loaded_databases.get()
+            if filename != self.opening_filename:
+                # The user opened another file since
+                if isinstance(database, PGNDatabase):
+                    database.close()
+                continue
+            self.opening_filename = None
+            self.root.title("Chess.py")
+            if isinstance(database, Exception):
+                x, y = self.root.winfo_x(), self.root.winfo_y()
+                widgets.info("Couldn't open the file:\n"+str(database), x, y)
+                continue
+            with database:
+                n = self.ask_for_game(database)
+                if n is None:
+                    continue
+                data = database.pgn(n)
+                games = len(database)
+            self.open_game(filename, data, games)
+
+    def open_game(self, filename: str, data: str, games: int) -> str:
+        """
+        Opens the game (`data` is its PGN) from `filename` which has
+        `games` games in it.
+        """
+        if self.board.set_pgn(data) == "break":
+            return "break" # If the players rejected the open
+        if games == 1:
             self.file_open = filename
-            self.update_pgn()
-            self.restart_analysing()
+            self.open_explorer(None)
+        else:
+            # Saving must not replace all of the other games
+            self.file_open = None
+            self.open_explorer(filename)
+        self.update_pgn()
+        self.restart_analysing()
+        self.update_explorer()
+
+    def ask_for_game(self, database: PGNDatabase) -> int:
+        """
+        Asks the user which game to open if there is more than 1 game in
+        the file. The user can type the number of the game or a player's
+        name (or a result like "1-0") to open the first game that matches.
+        Returns None if the user didn't pick a game.
+        """
+        if len(database) <= 1:
+            return 0 if len(database) == 1 else None
+        x, y = self.root.winfo_x(), self.root.winfo_y()
+        question = "There are %d games in the file. Write the number of the " \
+                   "game (1-%d) or a player's name." % (len(database),
+                                                        len(database))
+        window = widgets.Question(x, y)
+        window.ask_user_entry(question)
+        answer = window.wait()
+        if (answer is None) or (answer.strip() == ""):
+            return None
+        answer = answer.strip()
+        if answer.isdigit():
+            n = int(answer)-1
+            if 0 <= n < len(database):
+                return n
+            widgets.info("There is no game number "+answer, x, y)
+            return None
+        if answer in ("1-0", "0-1", "1/2-1/2", "*"):
+            games = database.filter(result=answer)
+        else:
+            games = database.filter(player=answer)
+        if len(games) == 0:
+            widgets.info("No games match "+repr(answer), x, y)
+            return None
+        return games[0]
+
+    def open_explorer(self, filename: str) -> None:
+        """
+        Closes the old opening explorer and opens the one for `filename`
+        (if it isn't None). The index might have to be built first so it
+        is done in another thread.
+        """
+        if self.explorer is not None:
+            self.explorer.close()
+        self.explorer = None
+        self.explorer_filename = filename
+        if filename is not None:
+            thread = threading.Thread(target=self.load_explorer,
+                                      args=(filename,))
+            thread.daemon = True
+            thread.start()
+
+    def load_explorer(self, filename: str) -> None:
+        """
+        Called in another thread by `open_explorer`.
+        """
+        try:
+            with PGNDatabase(filename) as database:
+                explorer = Explorer(database)
+        except (OSError, ValueError):
+            return None
+        self.loaded_explorers.put((filename, explorer))
+        try:
+            self.root.event_generate("<<ExplorerReady>>", when="tail")
+        except (RuntimeError, tk.TclError):
+            pass # The window is being destroyed
+
+    def explorer_ready(self, _=None) -> None:
+        """
+        Called by the "<<ExplorerReady>>" event. It uses the explorer if
+        it is still for the open file.
+        """
+        while not self.loaded_explorers.empty():
+            filename, explorer = self.loaded_explorers.get()
+            if (filename != self.explorer_filename) or \
+               (self.explorer is not None):
+                # The user opened another file while we were building it
+                explorer.close()
+                continue
+            self.explorer = explorer
+        self.update_explorer()
+
+    def update_explorer(self, _=None) -> None:
+        """
+        Shows the moves that were played from the current position in the
+        open PGN database (the most played first) under the analysis in
+        the suggested moves, and how many games reached the position and
+        their results under the move history.
+        """
+        if (self.explorer is None) or (not self.allowed_analyses):
+            # No database or not allowed to help (like in multiplayer)
+            self.explorer_moves_text = ""
+            self.explorer_label.pack_forget()
+            self.show_suggested_moves()
+            return None
+        board = self.board.board
+        stats = self.explorer.stats(board)
+        games = sum(stat[1] for stat in stats)
+        if games == 0:
+            self.explorer_moves_text = "DB: no games"
+            totals = "No games in the database"
+        else:
+            self.explorer_moves_text = "DB: "+" ".join(
+                                       "%s %d" % (board.san(move), n)
+                                       for move, n, *_ in stats[:3])
+            white = sum(stat[2] for stat in stats)
+            draws = sum(stat[3] for stat in stats)
+            black = sum(stat[4] for stat in stats)
+            totals = "%d games +%d%% =%d%% -%d%%" % (games, 100*white//games,
+                                                     100*draws//games,
+                                                     100*black//games)
+        self.explorer_label.config(text=totals)
+        self.explorer_label.pack(side="bottom", fill="x",
+                                 before=self.movehistory_text)
+        self.show_suggested_moves()
+
+    def show_suggested_moves(self) -> None:
+        """
+        Shows the moves from the analysis and (on the next line) the
+        moves from the open PGN database.
+        """
+        text = self.engine_moves_text
+        if self.explorer_moves_text != "":
+            text += "\n"+self.explorer_moves_text
+        self.suggestedmoves_text.config(text=text)
 
     def save_as(self, _=None) -> None:
         filename = widgets.asksave(filetypes=FILETYPES)
@@ -263,6 +483,7 @@ class App(SuperClass):
                 if (result != "break") and (result != "error"):
                     self.restart_analysing()
                     self.update_pgn()
+                    self.update_explorer()
 
     def view(self, event: str) -> None:
         if event == "current_fen":
@@ -325,46 +546,93 @@ class App(SuperClass):
         self.board.reset()
         self.stop_analysing()
         self.clear_pgn()
+        self.update_explorer()
 
     def change_settings(self, event: str) -> None:
         if event == "all_settings":
             x, y = self.root.winfo_x(), self.root.winfo_y()
             settings_setter = widgets.ChangeSettings(x, y)
 
-    def update(self) -> None:
+    def analysis_updated(self, lines: list) -> None:
+        """
+        Called from the analysis thread when a line changes. We can't use
+        tkinter from that thread so we just wake up the main thread. If an
+        update is already waiting we don't need to send another one.
+        """
+        if self.analysis_update_pending:
+            return None
+        self.analysis_update_pending = True
+        try:
+            self.root.event_generate("<<AnalysisUpdate>>", when="tail")
+        except (RuntimeError, tk.TclError):
+            # The window is being destroyed
+            self.analysis_update_pending = False
+
+    def update(self, _=None) -> None:
+        """
+        Shows the newest analysis lines. It is called by the
+        "<<AnalysisUpdate>>" event.
+        """
+        self.analysis_update_pending = False
         if self.done_set_up and self.analysing and (self.analyses is not None):
-            self.root.after(500, self.update)
+            lines = self.analyses.snapshot()
+            if len(lines) == 0:
+                return None
             try:
-                score = self.analyses.score.white()#.score(mate_score=10000)
+                score = lines[0].score.white()#.score(mate_score=10000)
                 self.eval_text.config(text=str(score).replace("+", ""))
-                moves = self.board.moves_to_san(self.analyses.moves)[:4]
-                self.suggestedmoves_text.config(text=" ".join(moves))
-            except:
-                pass
+                if len(lines) == 1:
+                    moves = self.board.moves_to_san(lines[0].pv)[:4]
+                else:
+                    # Show the first move of each line
+                    moves = [self.board.moves_to_san(line.pv[:1])[0]
+                             for line in lines]
+                self.engine_moves_text = " ".join(moves)
+                self.show_suggested_moves()
+            except (ValueError, AssertionError, AttributeError, IndexError):
+                pass # The lines are for a different position
 
     def update_pgn(self) -> None:
-        self.movehistory_text.config(state="normal")
-        old_pgn = self.movehistory_text.get("1.0", "end")[:-1]
-        new_pgn = self.board.pgn()
-        diff, clear = self.find_diff_pgn(old_pgn, new_pgn)
-        if clear:
-            self.clear_pgn()
-        self.movehistory_text.insert("end", diff)
-        self.movehistory_text.config(state="disabled")
+        """
+        Shows the moves from `self.board.history` in the move history. The
+        chunks that are already shown are kept so after a move or an undo
+        only the last chunk is inserted or deleted.
+        """
+        history = self.board.history
+        shown = self.history_shown
+        text = self.movehistory_text
+        text.config(state="normal")
+        if self.history_generation != history.generation:
+            # The history was reset so start again
+            self.history_generation = history.generation
+            text.delete("1.0", "end")
+            shown.clear()
+        # Find how many chunks are still correct
+        chunks = history.chunks
+        i = min(len(shown), len(chunks))
+        while (i > 0) and (shown[i-1] != chunks[i-1]):
+            i -= 1
+        removed = sum(map(len, shown[i:]))
+        if removed > 0:
+            # "end-1c" is just before the newline that tkinter always adds
+            text.delete("end-%dc"%(removed+1), "end-1c")
+        added = "".join(chunks[i:])
+        if added != "":
+            text.insert("end", added)
+        shown[i:] = chunks[i:]
+        text.config(state="disabled")
 
     def clear_pgn(self) -> None:
-        self.movehistory_text.delete("0.0", "end")
+        self.movehistory_text.config(state="normal")
+        self.movehistory_text.delete("1.0", "end")
+        self.movehistory_text.config(state="disabled")
+        self.history_shown = []
+        self.history_generation = None
 
     def moved(self) -> None:
         self.update_pgn()
         self.restart_analysing()
-
-    def find_diff_pgn(self, pgn1: str, pgn2: str):
-        if pgn1 == "\n":
-            pgn1 = ""
-        if pgn1 not in pgn2:
-            return pgn2, True
-        return pgn2[len(pgn1)-len(pgn2):][:-1], False
+        self.update_explorer()
 
     def start_analysing(self) -> None:
         if self.allowed_analyses:
@@ -372,9 +640,9 @@ class App(SuperClass):
             if not self.analysing:
                 self.analysing = True
                 self.analyses = Analyse(self.board.board)
+                self.analyses.subscribe(self.analysis_updated)
                 self.analyses.start()
                 self.eval_frame.grid()
-                self.update()
         else:
             self.analyses_var.set(False)
 
@@ -386,12 +654,17 @@ class App(SuperClass):
                 self.analyses.kill()
             if not self.allowed_analyses:
                 self.eval_text.config(text="x∈ℤ")
-                self.suggestedmoves_text.config(text="No moves to suggest")
+                self.engine_moves_text = "No moves to suggest"
+                self.show_suggested_moves()
+            self.update_explorer()
 
     def restart_analysing(self) -> None:
+        """
+        Tells the running analysis about the new position. The same
+        Stockfish process is kept so it doesn't have to start again.
+        """
         if self.analysing and self.allowed_analyses:
-            self.stop_analysing()
-            self.start_analysing()
+            self.analyses.set_position(self.board.board)
 
     def toggle_analyses(self, *events) -> str:
         if not self.allowed_analyses:
@@ -403,30 +676,31 @@ class App(SuperClass):
             self.start_analysing()
 
 
-try:
-    a = App()
-    a.root.mainloop()
-except Exception as error:
-    sys.stderr.write("An error occured.")
-    if REPORT_ERRORS:
-        sys.stderr.write(" We are going to report it.\n")
+if IS_PROGRAM:
+    try:
+        a = App()
+        a.root.mainloop()
+    except Exception as error:
+        sys.stderr.write("An error occured.")
+        if REPORT_ERRORS:
+            sys.stderr.write(" We are going to report it.\n")
 
-        import pickle
-        error_details = pickle.dumps(error)
+            import pickle
+            error_details = pickle.dumps(error)
 
-        import traceback
-        traceback_details = pickle.dumps(traceback.format_exc())
+            import traceback
+            traceback_details = pickle.dumps(traceback.format_exc())
 
-        full_error = {"error": error_details,
-                      "traceback": traceback_details}
+            full_error = {"error": error_details,
+                          "traceback": traceback_details}
 
-        try:
-            app_details = a.pickle()
-            full_error.update({"app": app_details})
-        except NameError:
-            pass
+            try:
+                app_details = a.pickle()
+                full_error.update({"app": app_details})
+            except NameError:
+                pass
 
-        reporter.report(full_error)
-    else:
-        sys.stderr.write(" We aren't going to report it.\n")
-    raise
+            reporter.report(full_error)
+        else:
+            sys.stderr.write(" We aren't going to report it.\n")
+        raise